@@ -1,4 +1,5 @@
 from .audio_recorder import AudioRecorder
 from .audio_player import AudioPlayer
+from .ring_buffer import RingBuffer
 
-__all__ = ['AudioRecorder', 'AudioPlayer']
\ No newline at end of file
+__all__ = ['AudioRecorder', 'AudioPlayer', 'RingBuffer']
\ No newline at end of file
@@ -1,63 +1,148 @@
 import io
 import pygame
-import tempfile
-import os
 import asyncio
 from typing import Dict, Any, Optional
 from utils.logger import print_timestamp_debug_log
+from .pcm_playback import FFmpegStreamDecoder, PCMOutputStream, create_mp3_decoder
+from .ring_buffer import RingBuffer
 
 class AudioStreamBuffer:
-    """Buffer for streaming audio data"""
+    """
+    Buffer for streaming audio data, backed by a preallocated ring buffer.
+    Chunks are handed out as memoryview slices that stay valid until the next
+    read_chunk call; writers wait once the fill level reaches the high-water mark.
+    """
     
-    def __init__(self, min_chunk_size: int = 3200):  # Increased to ~200ms at 16kHz
-        self.buffer = io.BytesIO()
+    def __init__(self, min_chunk_size: int = 3200, capacity: int = 65536,
+                 high_water_mark: Optional[int] = None):  # min chunk ~200ms of TTS audio
+        self.ring = RingBuffer(capacity)
         self.min_chunk_size = min_chunk_size
+        self.high_water_mark = high_water_mark if high_water_mark is not None else capacity * 3 // 4
         self.finished = False
+        self.aborted = False  # consumer went away (e.g. interrupted playback)
         self.condition = asyncio.Condition()
+        self._lent = 0  # size of the chunk currently held by the consumer
+        self._started = False
+        
+        # Stats
+        self.underruns = 0
+        self.backpressure_waits = 0
+        self.max_fill = 0
         
     async def write(self, data: bytes):
-        """Write audio data to buffer"""
+        """Write audio data to buffer, waiting while the buffer is above its high-water mark"""
+        view = memoryview(data)
         async with self.condition:
-            self.buffer.write(data)
-            # Notify waiting consumers if we have enough data
-            if self.buffer.tell() >= self.min_chunk_size:
-                self.condition.notify_all()
+            while len(view) and not self.aborted:
+                if self.ring.fill >= self.high_water_mark or self.ring.free == 0:
+                    self.backpressure_waits += 1
+                    await self.condition.wait()
+                    continue
+                
+                written = self.ring.write(view)
+                view = view[written:]
+                self.max_fill = max(self.max_fill, self.ring.fill)
+                
+                # Notify waiting consumers if we have enough data
+                if self.ring.fill - self._lent >= self.min_chunk_size:
+                    self.condition.notify_all()
     
-    async def read_chunk(self) -> Optional[bytes]:
+    async def read_chunk(self) -> Optional[memoryview]:
         """Read a chunk of audio data when available"""
         async with self.condition:
-            while self.buffer.tell() < self.min_chunk_size and not self.finished:
+            # The previous chunk has been used, give its space back to writers
+            if self._lent:
+                self.ring.consume(self._lent)
+                self._lent = 0
+                self.condition.notify_all()
+            
+            if self._started and self.ring.fill < self.min_chunk_size and not self.finished:
+                self.underruns += 1
+            while self.ring.fill < self.min_chunk_size and not self.finished and not self.aborted:
                 await self.condition.wait()
                 
-            if self.buffer.tell() == 0:
+            if self.ring.fill == 0 or self.aborted:
                 return None
-                
-            # Return all buffered data
-            self.buffer.seek(0)
-            data = self.buffer.read()
-            self.buffer = io.BytesIO()  # Reset buffer
-            return data if data else None
+            
+            # Hand out the buffered data in place
+            chunk = self.ring.peek()
+            self._lent = len(chunk)
+            self._started = True
+            return chunk
     
     async def finish(self):
         """Mark the stream as finished"""
         async with self.condition:
             self.finished = True
             self.condition.notify_all()
+    
+    async def abort(self):
+        """Consumer is gone: drop buffered data and release any waiting writer"""
+        async with self.condition:
+            self.aborted = True
+            self.ring.clear()
+            self._lent = 0
+            self.condition.notify_all()
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "fill": self.ring.fill,
+            "capacity": self.ring.capacity,
+            "high_water_mark": self.high_water_mark,
+            "max_fill": self.max_fill,
+            "underruns": self.underruns,
+            "backpressure_waits": self.backpressure_waits,
+        }
 
 class AudioPlayer:
     """
-    Audio player using pygame with streaming capability
+    Audio player with streaming capability.
+    The default "pcm" engine decodes the MP3 stream continuously and feeds one
+    long-lived PCM output stream; the "pygame" engine decodes chunk by chunk.
     """
     def __init__(self, config: Dict[str, Any]):
-        frequency = config.get("audio_player_frequency", 24000)
-        pygame.mixer.pre_init(frequency=frequency, size=-16, channels=1, buffer=512)  # Better settings for TTS
-        pygame.mixer.init()
+        self.frequency = config.get("audio_player_frequency", 24000)
         self.is_playing = False
         self.current_sound = None
         self.playback_interrupted = False
+        # Persistent ffmpeg decoder for chunks pygame cannot decode, one per playback stream
+        self.fallback_decoder: Optional[FFmpegStreamDecoder] = None
+        
+        # Completion is signalled through futures on the playback loop, never polled
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.current_stream: Optional[AudioStreamBuffer] = None
+        self.sound_done: Optional[asyncio.Future] = None
+        
+        # Continuous PCM engine, falls back to pygame if no MP3 decoder or output device is available
+        self.output = None
+        if config.get("audio_player_engine", "pcm") == "pcm":
+            try:
+                create_mp3_decoder(self.frequency).close()
+                self.output = PCMOutputStream(self.frequency, config.get("audio_player_buffer_frames", 1024))
+            except Exception as e:
+                print(f"Warning: PCM playback engine unavailable ({e}), falling back to pygame")
+                self.output = None
+        
+        if self.output is None:
+            pygame.mixer.pre_init(frequency=self.frequency, size=-16, channels=1, buffer=512)  # Better settings for TTS
+            pygame.mixer.init()
     
     async def play_stream(self, stream: AudioStreamBuffer):
         """Play audio stream in real-time"""
+        self.loop = asyncio.get_running_loop()
+        self.current_stream = stream
+        try:
+            if self.output is not None:
+                await self._play_stream_pcm(stream)
+            else:
+                await self._play_stream_chunks(stream)
+        finally:
+            self.current_stream = None
+            # Never leave the producer blocked on a stream nobody reads any more
+            await stream.abort()
+    
+    async def _play_stream_chunks(self, stream: AudioStreamBuffer):
+        """Play the stream chunk by chunk through pygame"""
         self.playback_interrupted = False
         try:
             # Play audio chunks as they arrive
@@ -74,15 +159,61 @@ class AudioPlayer:
                 chunk = await stream.read_chunk()
                 if chunk:
                     await self._play_audio_chunk(chunk)
+            
+            # Play whatever the fallback decoder still holds
+            if self.fallback_decoder is not None and not self.playback_interrupted:
+                pcm = await asyncio.to_thread(self.fallback_decoder.flush)
+                await self._play_pcm(pcm)
         except Exception as e:
             print(f"Error during playback: {e}")
         finally:
+            if self.fallback_decoder is not None:
+                self.fallback_decoder.close()
+                self.fallback_decoder = None
             self.playback_interrupted = False
 
+    async def _play_stream_pcm(self, stream: AudioStreamBuffer):
+        """Decode the MP3 stream continuously into the shared PCM output stream"""
+        self.playback_interrupted = False
+        decoder = None
+        completed = False
+        try:
+            decoder = create_mp3_decoder(self.frequency)
+            while not self.playback_interrupted:
+                chunk = await stream.read_chunk()
+                if chunk is None:
+                    break
+                
+                # The ffmpeg fallback decoder does pipe I/O, keep it off the event loop
+                pcm = await asyncio.to_thread(decoder.decode, chunk)
+                if not self.playback_interrupted:
+                    self.output.write(pcm)
+            
+            if not self.playback_interrupted:
+                self.output.write(await asyncio.to_thread(decoder.flush))
+                # Wait until the last sample has been played (or an interrupt clears the queue)
+                await self.output.wait_drained()
+            completed = not self.playback_interrupted
+        except Exception as e:
+            print(f"Error during playback: {e}")
+        finally:
+            if decoder is not None:
+                decoder.close()
+            if not completed:
+                # Interrupted or failed: stop the device instead of letting it play silence
+                self.output.stop()
+            self.playback_interrupted = False
+    
     async def _play_audio_chunk(self, audio_data: bytes):
         """Play a single audio chunk"""
         if self.playback_interrupted:
             return
+        
+        # Once the ffmpeg fallback holds part of this stream, later chunks must follow it
+        # through the same decoder, or they would play before its buffered output
+        if self.fallback_decoder is not None:
+            await self._play_chunk_with_decoder(audio_data)
+            return
             
         try:
             # Write to BytesIO for pygame
@@ -94,102 +225,84 @@ class AudioPlayer:
             channel = sound.play()
             
             # Wait for chunk to finish playing
-            while channel.get_busy() and not self.playback_interrupted:
-                await asyncio.sleep(0.01)
+            await self._wait_for_sound(sound, channel)
         except pygame.error as e:
             print(f"Pygame audio error: {e}")
-            # Try saving to temp file as fallback
-            await self._play_chunk_with_temp_file(audio_data)
+            # Decode through the persistent ffmpeg process instead
+            await self._play_chunk_with_decoder(audio_data)
         except Exception as e:
             print(f"Unexpected error in audio playback: {e}")
             # Try alternative method for problematic audio data
-            await self._play_chunk_as_wav(audio_data)
-            
-    async def _play_chunk_with_temp_file(self, audio_data: bytes):
-        """Fallback method using temporary file"""
+            await self._play_chunk_with_decoder(audio_data)
+    
+    async def _play_chunk_with_decoder(self, audio_data: bytes):
+        """
+        Fallback for MP3 data that pygame's mpg123 decoder rejects: feed it to one
+        long-lived ffmpeg process for this stream and play the PCM it returns.
+        Output lagging behind the input is played with later chunks or at the flush.
+        """
         if self.playback_interrupted:
             return
-            
+        
         try:
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-                temp_file.write(audio_data)
-                temp_filename = temp_file.name
-                
-            # Load and play sound from file
-            sound = pygame.mixer.Sound(temp_filename)
-            channel = sound.play()
-            
-            # Wait for playback to finish
-            while channel.get_busy() and not self.playback_interrupted:
-                await asyncio.sleep(0.01)
-                
-            # Clean up
-            os.unlink(temp_filename)
+            if self.fallback_decoder is None:
+                self.fallback_decoder = FFmpegStreamDecoder(self.frequency)
+            # Pipe I/O blocks briefly, keep it off the event loop
+            pcm = await asyncio.to_thread(self.fallback_decoder.decode, audio_data, 0.2)
+            await self._play_pcm(pcm)
         except Exception as e:
-            print(f"Fallback audio playback error: {e}")
-            # Try converting to WAV as last resort
-            await self._play_chunk_as_wav(audio_data)
+            print(f"Error in _play_chunk_with_decoder: {e}")
+            print("Completely failed to play audio chunk")
     
-    # 添加: 处理有问题的音频数据的新方法
-    async def _play_chunk_as_wav(self, audio_data: bytes):
+    async def _play_pcm(self, pcm: bytes):
+        """Play raw PCM in the mixer's own format, no decoding needed"""
+        if not pcm or self.playback_interrupted:
+            return
+        sound = pygame.mixer.Sound(buffer=pcm)
+        channel = sound.play()
+        
+        # Wait for playback to finish
+        await self._wait_for_sound(sound, channel)
+    
+    async def _wait_for_sound(self, sound, channel):
         """
-        Additional fallback method converting MP3 to WAV format
-        This helps with problematic MP3 data that causes mpg123 errors
+        Wait for a sound to finish playing. pygame only posts end events through the
+        display event queue, which would need polling itself, so completion comes
+        from a one-shot timer for the sound's length; interrupt() resolves it early.
         """
-        if self.playback_interrupted:
+        if channel is None or self.playback_interrupted:
             return
-            
+        loop = asyncio.get_running_loop()
+        self.sound_done = loop.create_future()
+        timer = loop.call_later(sound.get_length(), self._resolve_sound_done)
         try:
-            import subprocess
-            import sys
-            
-            # Create temporary files
-            with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as mp3_temp:
-                mp3_temp.write(audio_data)
-                mp3_filename = mp3_temp.name
-                
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as wav_temp:
-                wav_filename = wav_temp.name
-                
-            try:
-                # Use ffmpeg to convert MP3 to WAV (more robust than pygame's MP3 decoder)
-                # This bypasses the problematic mpg123 library
-                result = subprocess.run([
-                    "ffmpeg", "-y", "-i", mp3_filename, 
-                    "-acodec", "pcm_s16le", "-ar", "24000", "-ac", "1", 
-                    wav_filename
-                ], capture_output=True, timeout=10)
-                
-                if result.returncode == 0 and os.path.exists(wav_filename):
-                    # Load and play the converted WAV file
-                    sound = pygame.mixer.Sound(wav_filename)
-                    channel = sound.play()
-                    
-                    # Wait for playback to finish
-                    while channel.get_busy() and not self.playback_interrupted:
-                        await asyncio.sleep(0.01)
-                else:
-                    print("Failed to convert MP3 to WAV for playback")
-            finally:
-                # Clean up temporary files
-                for filename in [mp3_filename, wav_filename]:
-                    if os.path.exists(filename):
-                        os.unlink(filename)
-                        
-        except Exception as e:
-            print(f"Error in _play_chunk_as_wav: {e}")
-            # Last resort: try to play with pygame even if it might fail
-            try:
-                audio_file = io.BytesIO(audio_data)
-                sound = pygame.mixer.Sound(file=audio_file)
-                channel = sound.play()
-                while channel.get_busy() and not self.playback_interrupted:
-                    await asyncio.sleep(0.01)
-            except Exception:
-                print("Completely failed to play audio chunk")
-                pass
+            await self.sound_done
+        finally:
+            timer.cancel()
+            self.sound_done = None
+    
+    def _resolve_sound_done(self):
+        if self.sound_done is not None and not self.sound_done.done():
+            self.sound_done.set_result(None)
+    
+    def _wake_playback(self):
+        # Runs on the playback loop: end the current sound and stop waiting for stream data
+        self._resolve_sound_done()
+        if self.current_stream is not None:
+            asyncio.ensure_future(self.current_stream.abort())
     
     def interrupt(self):
-        pygame.mixer.stop()
+        """Stop playback immediately; safe to call from any thread"""
         self.playback_interrupted = True
-        return True
\ No newline at end of file
+        if self.output is not None:
+            self.output.clear()
+        if pygame.mixer.get_init():
+            pygame.mixer.stop()
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._wake_playback)
+        return True
+    
+    def close(self):
+        """Release the output device"""
+        if self.output is not None:
+            self.output.close()
\ No newline at end of file
@@ -0,0 +1,283 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import threading
+from collections import deque
+from typing import List, Optional
+import pyaudio
+
+try:
+    import av
+except ImportError:  # PyAV is optional, AudioPlayer falls back to pygame without it
+    av = None
+
+class MP3StreamDecoder:
+    """
+    Incremental MP3 decoder producing 16-bit mono PCM.
+    One codec context lives for the whole TTS stream, so data can be fed
+    at arbitrary cut points without gaps or per-chunk decoder setup.
+    """
+    def __init__(self, sample_rate: int = 24000):
+        if av is None:
+            raise RuntimeError("PyAV is not installed")
+        self.codec = av.CodecContext.create("mp3", "r")
+        self.resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+    
+    def decode(self, data: bytes) -> bytes:
+        """
+        Feed MP3 bytes and return whatever PCM is complete so far
+        """
+        return self._decode_packets(self.codec.parse(data))
+    
+    def flush(self) -> bytes:
+        """
+        Drain the parser, decoder and resampler at the end of the stream
+        """
+        pcm = self._decode_packets(self.codec.parse(b""))
+        pcm += self._pcm_from_frames(self.codec.decode(None))
+        pcm += self._pcm_from_frames([None])
+        return pcm
+    
+    def close(self):
+        # Nothing to release, the codec context is freed with the object
+        pass
+    
+    def _decode_packets(self, packets) -> bytes:
+        pcm = []
+        for packet in packets:
+            try:
+                pcm.append(self._pcm_from_frames(self.codec.decode(packet)))
+            except av.error.InvalidDataError:
+                # Skip a damaged frame (or a tag) instead of dropping the whole stream
+                continue
+        return b"".join(pcm)
+    
+    def _pcm_from_frames(self, frames) -> bytes:
+        pcm = []
+        for frame in frames:
+            for resampled in self.resampler.resample(frame):
+                pcm.append(resampled.to_ndarray().tobytes())
+        return b"".join(pcm)
+
+class FFmpegStreamDecoder:
+    """
+    MP3 to 16-bit mono PCM through one long-lived ffmpeg process per stream.
+    MP3 goes to its stdin and PCM is collected from its stdout by a reader
+    thread, entirely through pipes. The process is restarted if it dies.
+    """
+    def __init__(self, sample_rate: int = 24000):
+        if shutil.which("ffmpeg") is None:
+            raise RuntimeError("ffmpeg is not installed")
+        self.command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "mp3", "-i", "pipe:0",
+            "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", "1", "pipe:1"
+        ]
+        self.process: Optional[subprocess.Popen] = None
+        self.reader: Optional[threading.Thread] = None
+        self.condition = threading.Condition()
+        self.pcm = bytearray()
+        self.restarts = 0
+    
+    def decode(self, data: bytes, timeout: float = 0.0) -> bytes:
+        """
+        Feed MP3 bytes and return the PCM decoded so far, waiting up to
+        `timeout` seconds for some output to appear
+        """
+        self._write(data)
+        with self.condition:
+            if timeout > 0 and not self.pcm:
+                self.condition.wait(timeout)
+            return self._take()
+    
+    def flush(self, timeout: float = 2.0) -> bytes:
+        """
+        Close the input and return the remaining PCM once ffmpeg has finished
+        """
+        process, reader = self.process, self.reader
+        self.process, self.reader = None, None
+        if process is not None:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+            reader.join(timeout)
+            self._stop(process)
+        with self.condition:
+            return self._take()
+    
+    def close(self):
+        process, self.process, self.reader = self.process, None, None
+        if process is not None:
+            self._stop(process)
+        with self.condition:
+            self.pcm = bytearray()
+    
+    def _write(self, data: bytes):
+        for attempt in range(2):
+            if self.process is not None and self.process.poll() is not None:
+                print("ffmpeg decoder exited, restarting")
+                self._restart()
+            if self.process is None:
+                self._start()
+            try:
+                self.process.stdin.write(data)
+                self.process.stdin.flush()
+                return
+            except (BrokenPipeError, OSError) as e:
+                print(f"ffmpeg decoder pipe failed ({e}), restarting")
+                self._restart()
+    
+    def _restart(self):
+        self.restarts += 1
+        self._stop(self.process)
+        self.process = None
+    
+    def _start(self):
+        self.process = subprocess.Popen(
+            self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        )
+        self.reader = threading.Thread(target=self._read_output, args=(self.process,), daemon=True)
+        self.reader.start()
+    
+    def _read_output(self, process: subprocess.Popen):
+        fd = process.stdout.fileno()
+        while True:
+            data = os.read(fd, 4096)
+            if not data:
+                break
+            with self.condition:
+                self.pcm += data
+                self.condition.notify_all()
+    
+    def _take(self) -> bytes:
+        # Only hand out whole 16-bit samples
+        usable = len(self.pcm) - len(self.pcm) % 2
+        data = bytes(self.pcm[:usable])
+        del self.pcm[:usable]
+        return data
+    
+    @staticmethod
+    def _stop(process: subprocess.Popen):
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+def create_mp3_decoder(sample_rate: int = 24000):
+    """
+    Prefer the in-process PyAV decoder, fall back to a persistent ffmpeg process
+    """
+    if av is not None:
+        return MP3StreamDecoder(sample_rate)
+    return FFmpegStreamDecoder(sample_rate)
+
+class PCMOutputStream:
+    """
+    One long-lived PyAudio output stream, fed from a PCM queue by its callback.
+    The stream is started when audio is queued and stopped again once drained,
+    so an idle player costs nothing.
+    """
+    def __init__(self, sample_rate: int = 24000, frames_per_buffer: int = 1024):
+        self.sample_rate = sample_rate
+        self.pa = pyaudio.PyAudio()
+        self.stream = self.pa.open(
+            format=pyaudio.paInt16,
+            channels=1,
+            rate=sample_rate,
+            output=True,
+            frames_per_buffer=frames_per_buffer,
+            stream_callback=self._callback,
+            start=False
+        )
+        self.lock = threading.Lock()
+        self.chunks: deque = deque()
+        self.offset = 0  # read position inside chunks[0]
+        self.buffered = 0
+        self._drain_waiters: List[tuple] = []  # (loop, future)
+    
+    def write(self, pcm: bytes):
+        """
+        Queue PCM for playback, starting the output stream if it is idle
+        """
+        if not pcm:
+            return
+        with self.lock:
+            self.chunks.append(pcm)
+            self.buffered += len(pcm)
+        if not self.stream.is_active():
+            self.stream.start_stream()
+    
+    def clear(self):
+        """
+        Drop all queued audio immediately (used for interrupts)
+        """
+        with self.lock:
+            self.chunks.clear()
+            self.offset = 0
+            self.buffered = 0
+        self._wake_drain_waiters()
+    
+    async def wait_drained(self):
+        """
+        Wait until every queued sample has been handed to the device, then go idle
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.buffered == 0:
+                future.set_result(None)
+            else:
+                self._drain_waiters.append((loop, future))
+        await future
+        
+        with self.lock:
+            idle = self.buffered == 0
+        if idle and self.stream.is_active():
+            self.stream.stop_stream()
+    
+    def stop(self):
+        """
+        Drop queued audio and stop the output stream, e.g. after an interrupt or error
+        """
+        self.clear()
+        if self.stream.is_active():
+            self.stream.stop_stream()
+    
+    def close(self):
+        self.clear()
+        self.stream.close()
+        self.pa.terminate()
+    
+    def _wake_drain_waiters(self):
+        with self.lock:
+            waiters, self._drain_waiters = self._drain_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(self._resolve, future)
+    
+    @staticmethod
+    def _resolve(future: asyncio.Future):
+        if not future.done():
+            future.set_result(None)
+    
+    def _callback(self, in_data, frame_count, time_info, status):
+        needed = frame_count * 2  # 16-bit mono
+        out = bytearray()
+        with self.lock:
+            while self.chunks and len(out) < needed:
+                chunk = self.chunks[0]
+                take = min(needed - len(out), len(chunk) - self.offset)
+                out += chunk[self.offset:self.offset + take]
+                self.offset += take
+                if self.offset == len(chunk):
+                    self.chunks.popleft()
+                    self.offset = 0
+            self.buffered -= len(out)
+            drained = self.buffered == 0
+        
+        if len(out) < needed:
+            # Pad with silence rather than stall the device
+            out += bytes(needed - len(out))
+        if drained:
+            self._wake_drain_waiters()
+        return bytes(out), pyaudio.paContinue
\ No newline at end of file
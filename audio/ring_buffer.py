@@ -0,0 +1,61 @@
+from typing import Optional
+
+class RingBuffer:
+    """
+    Preallocated byte ring buffer.
+    Reads hand out memoryview slices of the ring itself instead of copies; the
+    caller consumes them once done. It has no locking or asyncio dependency, so
+    the same structure serves TTS playback streams and microphone capture alike.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._read_pos = 0
+        self._size = 0
+    
+    @property
+    def fill(self) -> int:
+        return self._size
+    
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+    
+    def write(self, data) -> int:
+        """
+        Copy as much of data as fits, returns the number of bytes written
+        """
+        data = memoryview(data).cast("B")
+        count = min(len(data), self.free)
+        write_pos = (self._read_pos + self._size) % self.capacity
+        
+        # At most two copies: up to the end of the ring, then from its start
+        first = min(count, self.capacity - write_pos)
+        self._view[write_pos:write_pos + first] = data[:first]
+        if count > first:
+            self._view[:count - first] = data[first:count]
+        self._size += count
+        return count
+    
+    def peek(self, max_bytes: Optional[int] = None) -> memoryview:
+        """
+        Contiguous view of the oldest readable bytes, without copying or consuming.
+        It may be shorter than fill when the data wraps around the end of the ring.
+        """
+        length = min(self._size, self.capacity - self._read_pos)
+        if max_bytes is not None:
+            length = min(length, max_bytes)
+        return self._view[self._read_pos:self._read_pos + length]
+    
+    def consume(self, count: int):
+        """
+        Release bytes previously returned by peek so the space can be reused
+        """
+        count = min(count, self._size)
+        self._read_pos = (self._read_pos + count) % self.capacity
+        self._size -= count
+    
+    def clear(self):
+        self._read_pos = 0
+        self._size = 0
\ No newline at end of file
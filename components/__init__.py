@@ -1,5 +1,8 @@
 from .memory import WorkMemory
 from .session_manager import SessionManager
 from .text_guardrail import TextGuardrail
+from .sentence_splitter import SentenceSplitter
+from .worker_stage import WorkerStage
+from .intent_router import IntentRouter
 
-__all__ = ['WorkMemory', 'SessionManager', 'TextGuardrail']
\ No newline at end of file
+__all__ = ['WorkMemory', 'SessionManager', 'TextGuardrail', 'SentenceSplitter', 'WorkerStage', 'IntentRouter']
\ No newline at end of file
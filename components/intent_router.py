@@ -0,0 +1,136 @@
+import random
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+class IntentRouter:
+    """
+    Rule-based local intent classifier that runs before the routing LLM.
+    Clear vision, search and chit-chat requests are routed directly; anything
+    ambiguous falls back to the LLM deciding on tools.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.enabled = config.get("intent_router_enabled", True)
+        # Rules only match request forms; a bare keyword ("看看", "天气", "news") is not enough,
+        # since a wrong local match skips the LLM with no way to recover
+        self.rules = {
+            "vision_analysis": self._compile(config.get("intent_vision_patterns", [
+                r"^(我的?)?(前面|面前|眼前|前方|周围|旁边)(是|有)(什么|啥|谁)(东西|人)?[吗呢啊？?。！!\s]*$",
+                r"^(我的?)?(前面|面前|眼前|前方)有没有(人|东西|车|障碍物?)[？?。！!\s]*$",
+                r"^(请|你)?(帮我)?(看看|看一下|看下|瞧瞧)(我的?)?(前面|面前|眼前|周围)(有什么|是什么)?[吗呢啊？?。！!\s]*$",
+                r"^(请|你)?(帮我)?(看看|看一下|看下|瞧瞧)(这个|这里|这)(是什么|是啥)?[吗呢啊？?。！!\s]*$",
+                r"^(这|那)(个|里)?是什么(东西|地方)?[？?。！!\s]*$",
+                r"^(请|你)?(帮我)?(念|读)(一下)?(这|上面)(个|里|的)?(字|文字|内容)[吗呢啊？?。！!\s]*$",
+                r"^what('?s| is) (in front of|around) me[?.!\s]*$",
+                r"^what (do|can) you see[?.!\s]*$",
+                r"^(please )?(look at|describe) (this|what('?s| is) in front of me)[?.!\s]*$",
+            ])),
+            "web_search": self._compile(config.get("intent_search_patterns", [
+                r"^(请|你)?(帮我)?(搜索|搜一下|查一下|查查|上网查|网上查)(一下)?.{2,}",
+                r"(天气(怎么样|如何|预报)|天气.{0,4}(多少度|会下雨吗|下雨吗)|(明天|后天|今晚).{0,4}(会下雨|下雨吗|多少度))[吗呢啊？?。！!\s]*$",
+                r"^(今天|今日|最近)?(有(什么|哪些)(新闻|消息)|(最新|今日)的?新闻(是什么)?)[吗呢啊？?。！!\s]*$",
+                r"(股价|汇率|比分)(是)?多少[吗呢啊？?。！!\s]*$",
+                r"^(please )?(search|google|look up) (for )?.{3,}",
+                r"^what('?s| is) the weather|weather (forecast|today|tomorrow)[?.!\s]*$",
+                r"^what('?s| is) the (latest )?news|^(any|latest) news",
+            ])),
+            # Bare confirmations ("好", "嗯", "ok") are left out: they usually answer an offer
+            # and need the context and tools of the routing LLM
+            "chat": self._compile(config.get("intent_chat_patterns", [
+                r"^(你好|您好|嗨|哈喽|谢谢|多谢|谢啦|晚安|早上好)[啊呀呢吧！!。.，,\s]*$",
+                r"^(你是谁|你叫什么名字?)[？?！!。.\s]*$",
+                r"^(hi|hello|hey|thanks|thank you|good night|good morning)[!.,\s]*$",
+            ])),
+        }
+        # Command words removed from a locally routed search query
+        self.search_prefixes = self._compile(config.get("intent_search_prefixes", [
+            r"^(请|你)?(帮我)?(搜索|搜一下|查一下|查查|上网查|网上查)(一下)?[：:，,\s]*",
+            r"^(please )?(search|google|look up) (for )?",
+        ]))
+        
+        # Fraction of locally routed turns checked against the routing LLM in the background
+        self.shadow_rate = config.get("intent_router_shadow_rate", 0.1)
+        
+        self.routed = {intent: 0 for intent in self.rules}
+        self.fallbacks = 0
+        self.shadow_checked = 0
+        self.shadow_agreed = 0
+        self.llm_routing_time = 0.0
+        self.llm_routing_calls = 0
+        self.time_saved = 0.0
+    
+    @staticmethod
+    def _compile(patterns: List[str]) -> List[re.Pattern]:
+        return [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+    
+    def route(self, text: str, previous_reply: Optional[str] = None) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        Classify text as (intent, tool arguments), where intent is a tool name or "chat".
+        previous_reply is the last assistant message, if any.
+        Returns None when no rule or more than one intent matches.
+        """
+        if not self.enabled:
+            return None
+        
+        text = text.strip()
+        matches = [intent for intent, patterns in self.rules.items()
+                   if any(pattern.search(text) for pattern in patterns)]
+        # A reply to a question or offer depends on it, so only the routing LLM can judge it
+        if matches == ["chat"] and previous_reply and previous_reply.rstrip().endswith(("？", "?")):
+            matches = []
+        if len(matches) != 1:
+            self.fallbacks += 1
+            return None
+        
+        intent = matches[0]
+        self.routed[intent] += 1
+        if intent == "chat":
+            return intent, {}
+        
+        # A locally routed tool call saves the routing LLM round trip
+        self.time_saved += self.average_llm_routing_time()
+        if intent == "vision_analysis":
+            return intent, {"prompt": text}
+        return intent, {"query": self._search_query(text)}
+    
+    def _search_query(self, text: str) -> str:
+        query = text
+        for pattern in self.search_prefixes:
+            query = pattern.sub("", query, count=1)
+        query = query.strip(" 。？！?!.，,")
+        return query or text
+    
+    def should_shadow_check(self) -> bool:
+        return random.random() < self.shadow_rate
+    
+    def record_llm_routing(self, elapsed: float):
+        """
+        Record how long a routing LLM call took, used to estimate time saved
+        """
+        self.llm_routing_time += elapsed
+        self.llm_routing_calls += 1
+    
+    def record_shadow_result(self, local_intent: str, llm_intent: str):
+        """
+        Compare a local decision with the routing LLM's decision for the same turn
+        """
+        self.shadow_checked += 1
+        if local_intent == llm_intent:
+            self.shadow_agreed += 1
+        else:
+            print(f"Intent router disagreement: local={local_intent}, llm={llm_intent}")
+    
+    def average_llm_routing_time(self) -> float:
+        if self.llm_routing_calls == 0:
+            return 0.0
+        return self.llm_routing_time / self.llm_routing_calls
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "routed": dict(self.routed),
+            "fallbacks": self.fallbacks,
+            "shadow_checked": self.shadow_checked,
+            "shadow_agreed": self.shadow_agreed,
+            "accuracy": self.shadow_agreed / self.shadow_checked if self.shadow_checked else None,
+            "avg_llm_routing_time": self.average_llm_routing_time(),
+            "time_saved": self.time_saved,
+        }
\ No newline at end of file
@@ -1,45 +1,255 @@
+import itertools
+import re
+import sys
 import time
 import uuid
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict, deque
+from typing import List, Dict, Any, Deque, Optional, Tuple
+from .memory_store import ConversationStore
+
+# CJK characters are roughly one token each; other text averages about four characters per token
+CJK_CHARS = re.compile(r"[\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af\uf900-\ufaff]")
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the token count of text without a tokenizer
+    """
+    if not text:
+        return 0
+    cjk_count = len(CJK_CHARS.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
 
 class WorkMemory:
     """
-    Memory management for conversation history
+    Memory management for conversation history.
+    Each session is a bounded ring buffer, and old or excess sessions are evicted.
     """
     def __init__(self, config: Dict[str, Any]):
         self.max_turns = config.get("memory_max_turns", 100)
-        self.sessions: Dict[str, List[Dict[str, str]]] = {}
-        self.session_timestamps: Dict[str, float] = {}  # Track last activity time for each session
+        self.max_sessions = config.get("memory_max_sessions", 20)
+        self.session_ttl = config.get("memory_session_ttl", 24 * 3600)  # seconds since last activity
+        self.sessions: Dict[str, Deque[Dict[str, Any]]] = {}
+        # Last activity time for each session, least recently used first
+        self.session_timestamps: "OrderedDict[str, float]" = OrderedDict()
+        self.evicted_sessions = 0
+        
+        # Token budget for the history sent with each request; older turns are folded into a summary
+        self.token_budget = config.get("memory_token_budget", 2000)
+        self.summary_trigger_tokens = config.get("memory_summary_trigger_tokens", int(self.token_budget * 0.75))
+        self.keep_recent_tokens = config.get("memory_keep_recent_tokens", 600)
+        self.summaries: Dict[str, str] = {}
+        self.summarizing: set = set()  # Sessions with a summary in progress
+        
+        # Optional persistent backend; sessions are loaded lazily on first access
+        store_path = config.get("memory_store_path")
+        self.store: Optional[ConversationStore] = None
+        if store_path:
+            self.store = ConversationStore(store_path, config.get("memory_store_retention_days", 30))
+    
+    def _touch_session(self, session_id: str):
+        self.session_timestamps[session_id] = time.time()
+        self.session_timestamps.move_to_end(session_id)
+        self._evict_sessions()
     
-    def add_message(self, session_id: str, role: str, content: str):
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
+    def _evict_sessions(self):
+        """
+        Evict expired sessions and the least recently used ones beyond max_sessions
+        """
+        now = time.time()
+        while self.session_timestamps:
+            oldest_id, last_activity = next(iter(self.session_timestamps.items()))
+            if len(self.session_timestamps) <= self.max_sessions and now - last_activity <= self.session_ttl:
+                break
+            # Evicted sessions stay in the persistent store and are reloaded on demand
+            self._unload_session(oldest_id)
+            self.evicted_sessions += 1
+    
+    def _get_session(self, session_id: str) -> Deque[Dict[str, Any]]:
+        """
+        Return the session's messages, loading its recent window from the store on first access
+        """
+        messages = self.sessions.get(session_id)
+        if messages is not None:
+            return messages
         
-        self.sessions[session_id].append({
+        # Ring buffer: the oldest messages fall off without copying the history
+        messages = deque(maxlen=self.max_turns * 2)  # *2 for user + assistant pairs
+        self.sessions[session_id] = messages
+        if self.store is not None:
+            stored_messages, summary = self.store.load_session(session_id, self.max_turns * 2)
+            messages.extend(stored_messages)
+            if summary:
+                self.summaries[session_id] = summary
+            self._drop_partial_turn(messages)
+            self._enforce_token_budget(session_id)
+        return messages
+    
+    @staticmethod
+    def _drop_partial_turn(messages: Deque[Dict[str, Any]]):
+        # Never start the history in the middle of a turn
+        while messages and messages[0]["role"] != "user":
+            messages.popleft()
+    
+    def add_message(self, session_id: str, role: str, content: str, **fields):
+        """
+        Append a message; extra fields (tool_calls, tool_call_id, name) are stored with it
+        """
+        messages = self._get_session(session_id)
+        message = {
             "role": role,
-            "content": content
-        })
+            "content": content,
+            **fields
+        }
+        messages.append(message)
+        if self.store is not None:
+            self.store.append_message(session_id, message, time.time())
+        
+        # The ring buffer may have wrapped in the middle of a turn
+        self._drop_partial_turn(messages)
         
         # Update session timestamp
-        self.session_timestamps[session_id] = time.time()
+        self._touch_session(session_id)
         
-        # Keep only the last max_turns messages
-        if len(self.sessions[session_id]) > self.max_turns * 2:  # *2 for user + assistant pairs
-            self.sessions[session_id] = self.sessions[session_id][-self.max_turns*2:]
+        self._enforce_token_budget(session_id)
     
-    def get_history(self, session_id: str) -> List[Dict[str, str]]:
-        return self.sessions.get(session_id, [])
+    @staticmethod
+    def _message_tokens(message: Dict[str, Any]) -> int:
+        tokens = 4 + estimate_tokens(message.get("content") or "")  # per-message formatting overhead
+        for tool_call in message.get("tool_calls", []):
+            tokens += estimate_tokens(tool_call["function"]["name"]) + estimate_tokens(tool_call["function"]["arguments"])
+        return tokens
     
-    def clear_session(self, session_id: str):
+    def get_history_tokens(self, session_id: str) -> int:
+        return sum(self._message_tokens(message) for message in self.sessions.get(session_id, []))
+    
+    @staticmethod
+    def _turn_starts(messages: Deque[Dict[str, Any]]) -> List[int]:
+        # A turn starts at a user message, so tool calls stay together with their results
+        return [i for i, message in enumerate(messages) if message["role"] == "user"]
+    
+    def _drop_oldest(self, messages: Deque[Dict[str, Any]], count: int) -> int:
+        # Returns the estimated tokens removed
+        removed = 0
+        for _ in range(count):
+            removed += self._message_tokens(messages.popleft())
+        return removed
+    
+    def _enforce_token_budget(self, session_id: str):
+        """
+        Drop the oldest whole turns when the summary has not kept up with the budget
+        """
+        messages = self.sessions[session_id]
+        total = self.get_history_tokens(session_id)
+        while total > self.token_budget:
+            later_turns = [i for i in self._turn_starts(messages) if i > 0]
+            if not later_turns:
+                break
+            total -= self._drop_oldest(messages, later_turns[0])
+            print(f"Memory over token budget, dropped {later_turns[0]} messages without summary")
+    
+    def take_messages_to_summarize(self, session_id: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Pick the oldest turns to fold into the summary once the history passes the trigger size.
+        Returns (previous summary, messages), or None when no summary is needed.
+        """
+        messages = self.sessions.get(session_id)
+        if not messages or session_id in self.summarizing:
+            return None
+        if self.get_history_tokens(session_id) <= self.summary_trigger_tokens:
+            return None
+        
+        # Keep whole recent turns that fit in keep_recent_tokens, always at least the last turn
+        turn_starts = [i for i in self._turn_starts(messages) if i > 0]
+        if not turn_starts:
+            return None
+        cut = turn_starts[-1]
+        for start in turn_starts:
+            recent = itertools.islice(messages, start, None)
+            if sum(self._message_tokens(message) for message in recent) <= self.keep_recent_tokens:
+                cut = start
+                break
+        
+        self.summarizing.add(session_id)
+        return self.summaries.get(session_id, ""), list(itertools.islice(messages, cut))
+    
+    def apply_summary(self, session_id: str, summary: Optional[str], folded: List[Dict[str, Any]]):
+        """
+        Replace the folded messages with the new summary; a None summary keeps the messages
+        """
+        self.summarizing.discard(session_id)
+        if summary is None or session_id not in self.sessions:
+            return
+        self.summaries[session_id] = summary
+        # Folded messages are the oldest ones, unless they were already trimmed
+        folded_ids = {id(message) for message in folded}
+        messages = self.sessions[session_id]
+        while messages and id(messages[0]) in folded_ids:
+            messages.popleft()
+        
+        if self.store is not None:
+            # Everything older than the messages still held in memory is now covered by the summary
+            self.store.save_summary(session_id, summary, len(messages))
+    
+    def get_summary(self, session_id: str) -> str:
+        return self.summaries.get(session_id, "")
+    
+    def get_history(self, session_id: str) -> Deque[Dict[str, Any]]:
+        if self.store is not None:
+            return self._get_session(session_id)
+        return self.sessions.get(session_id, deque())
+    
+    def _unload_session(self, session_id: str):
         if session_id in self.sessions:
             del self.sessions[session_id]
         if session_id in self.session_timestamps:
             del self.session_timestamps[session_id]
+        self.summaries.pop(session_id, None)
+        self.summarizing.discard(session_id)
+    
+    def clear_session(self, session_id: str):
+        self._unload_session(session_id)
+        if self.store is not None:
+            self.store.delete_session(session_id)
+    
+    def get_latest_session(self) -> Optional[Tuple[str, float]]:
+        """
+        The most recently active stored session and its last activity time, to resume after a restart
+        """
+        if self.store is None:
+            return None
+        return self.store.get_latest_session()
+    
+    def close(self):
+        """
+        Commit pending writes and close the persistent store
+        """
+        if self.store is not None:
+            self.store.close()
     
     def get_session_timestamp(self, session_id: str) -> Optional[float]:
         return self.session_timestamps.get(session_id)
     
     def create_new_session(self) -> str:
         new_session_id = str(uuid.uuid4())
-        self.session_timestamps[new_session_id] = time.time()
-        return new_session_id
\ No newline at end of file
+        self._touch_session(new_session_id)
+        return new_session_id
+    
+    def get_memory_stats(self) -> Dict[str, Any]:
+        """
+        Session counts and approximate memory held by stored messages
+        """
+        message_count = 0
+        approx_bytes = 0
+        for messages in self.sessions.values():
+            message_count += len(messages)
+            for message in messages:
+                approx_bytes += sys.getsizeof(message)
+                approx_bytes += sum(sys.getsizeof(value) for value in message.values())
+        approx_bytes += sum(sys.getsizeof(summary) for summary in self.summaries.values())
+        return {
+            "sessions": len(self.session_timestamps),
+            "messages": message_count,
+            "approx_bytes": approx_bytes,
+            "evicted_sessions": self.evicted_sessions,
+            "store": self.store.get_stats() if self.store is not None else {},
+        }
\ No newline at end of file
@@ -0,0 +1,182 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+class ConversationStore:
+    """
+    SQLite-backed persistent conversation store.
+    Writes go through a write-behind queue drained by a background thread, so callers never
+    wait on disk I/O. Reads load only a session's recent window.
+    """
+    def __init__(self, path: str, retention_days: float = 30.0, batch_size: int = 64,
+                 prune_interval: float = 3600.0):
+        self.path = path
+        self.retention_days = retention_days
+        self.prune_interval = prune_interval  # seconds between retention sweeps
+        self.batch_size = batch_size
+        self.write_queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        
+        # Readers use their own connection; WAL lets them run alongside the writer
+        self.read_lock = threading.Lock()
+        self.read_conn = self._connect()
+        self._create_schema(self.read_conn)
+        
+        self.writer_thread = threading.Thread(target=self._write_loop, name="memory-store", daemon=True)
+        self.writer_thread.start()
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "data TEXT NOT NULL, created REAL NOT NULL, folded INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, last_activity REAL NOT NULL, summary TEXT NOT NULL DEFAULT '')"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_activity ON sessions (last_activity)")
+    
+    # Write-behind operations, applied in order by the writer thread
+    
+    def append_message(self, session_id: str, message: Dict[str, Any], timestamp: float):
+        self.write_queue.put(("append", session_id, json.dumps(message, ensure_ascii=False), timestamp))
+    
+    def save_summary(self, session_id: str, summary: str, kept_count: int):
+        """
+        Store the summary and mark all but the newest kept_count unfolded messages as summarized
+        """
+        self.write_queue.put(("summary", session_id, summary, kept_count))
+    
+    def delete_session(self, session_id: str):
+        self.write_queue.put(("delete", session_id))
+    
+    def _apply(self, conn: sqlite3.Connection, op: tuple):
+        kind, session_id = op[0], op[1]
+        if kind == "append":
+            conn.execute("INSERT INTO messages (session_id, data, created) VALUES (?, ?, ?)", (session_id, op[2], op[3]))
+            self._upsert_session(conn, session_id, op[3])
+        elif kind == "summary":
+            conn.execute("UPDATE sessions SET summary = ? WHERE session_id = ?", (op[2], session_id))
+            conn.execute(
+                "UPDATE messages SET folded = 1 WHERE session_id = ? AND folded = 0 AND id NOT IN "
+                "(SELECT id FROM messages WHERE session_id = ? AND folded = 0 ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, op[3])
+            )
+        elif kind == "delete":
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+    
+    @staticmethod
+    def _upsert_session(conn: sqlite3.Connection, session_id: str, timestamp: float):
+        conn.execute(
+            "INSERT INTO sessions (session_id, last_activity) VALUES (?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET last_activity = MAX(last_activity, excluded.last_activity)",
+            (session_id, timestamp)
+        )
+    
+    def _prune(self, conn: sqlite3.Connection):
+        # Drop sessions past the retention period, on the writer thread
+        cutoff = time.time() - self.retention_days * 86400
+        with conn:
+            conn.execute(
+                "DELETE FROM messages WHERE session_id IN (SELECT session_id FROM sessions WHERE last_activity < ?)",
+                (cutoff,)
+            )
+            conn.execute("DELETE FROM sessions WHERE last_activity < ?", (cutoff,))
+    
+    def _write_loop(self):
+        conn = self._connect()
+        next_prune = 0.0
+        while True:
+            # Sweep at startup and then periodically, so long-running devices also expire old sessions
+            if time.time() >= next_prune:
+                try:
+                    self._prune(conn)
+                except sqlite3.Error as e:
+                    print(f"Memory store prune failed: {e}")
+                next_prune = time.time() + self.prune_interval
+            
+            try:
+                ops = [self.write_queue.get(timeout=max(0.0, next_prune - time.time()))]
+            except queue.Empty:
+                continue
+            # Batch whatever else is queued into the same transaction
+            while len(ops) < self.batch_size:
+                try:
+                    ops.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = False
+            try:
+                with conn:
+                    for op in ops:
+                        if op is None:
+                            stop = True
+                        else:
+                            self._apply(conn, op)
+                            self.written += 1
+                self.batches += 1
+            except sqlite3.Error as e:
+                self.errors += 1
+                print(f"Memory store write failed: {e}")
+            
+            if stop:
+                break
+        conn.close()
+    
+    def close(self):
+        self.write_queue.put(None)
+        self.writer_thread.join(timeout=5.0)
+        with self.read_lock:
+            self.read_conn.close()
+    
+    # Reads
+    
+    def load_session(self, session_id: str, limit: int) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        Load the most recent unsummarized messages of a session and its summary
+        """
+        with self.read_lock:
+            rows = self.read_conn.execute(
+                "SELECT data FROM messages WHERE session_id = ? AND folded = 0 ORDER BY id DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+            summary_row = self.read_conn.execute(
+                "SELECT summary FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        messages = [json.loads(row[0]) for row in reversed(rows)]
+        return messages, summary_row[0] if summary_row else ""
+    
+    def get_latest_session(self) -> Optional[Tuple[str, float]]:
+        """
+        The most recently active session and its last activity time
+        """
+        with self.read_lock:
+            row = self.read_conn.execute(
+                "SELECT session_id, last_activity FROM sessions ORDER BY last_activity DESC LIMIT 1"
+            ).fetchone()
+        return (row[0], row[1]) if row else None
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "queued": self.write_queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
\ No newline at end of file
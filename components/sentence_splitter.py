@@ -0,0 +1,59 @@
+import re
+from typing import List, Optional
+
+class SentenceSplitter:
+    """
+    Incrementally split a streamed LLM reply into sentences for TTS
+    """
+    # Sentence-final punctuation (Chinese and English), with any closing quotes.
+    # An ASCII period only ends a sentence when followed by whitespace, so
+    # decimals such as 3.5 and URLs are not cut in half.
+    SENTENCE_END = re.compile(r'[。！？!?；;…\n]+["”’』」)）]*|\.(?=\s)')
+    # Clause boundaries used only when a sentence grows too long without ending
+    SOFT_BREAK = re.compile(r'[，,、：:]')
+    
+    def __init__(self, min_chars: int = 4, max_chars: int = 60):
+        self.min_chars = min_chars
+        self.max_chars = max_chars
+        self.buffer = ""
+    
+    def feed(self, text: str) -> List[str]:
+        """
+        Add streamed text and return the sentences completed by it
+        """
+        self.buffer += text
+        sentences = []
+        while True:
+            sentence = self._next_sentence()
+            if sentence is None:
+                break
+            sentences.append(sentence)
+        return sentences
+    
+    def flush(self) -> Optional[str]:
+        """
+        Return whatever is left once the stream has ended
+        """
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        return remainder if remainder else None
+    
+    def _next_sentence(self) -> Optional[str]:
+        # Very short sentences (e.g. "好。") are merged with the next one
+        for match in self.SENTENCE_END.finditer(self.buffer):
+            if len(self.buffer[:match.end()].strip()) >= self.min_chars:
+                return self._cut(match.end())
+        
+        # Long run without sentence-final punctuation: break at the last clause
+        if len(self.buffer) >= self.max_chars:
+            last_break = None
+            for match in self.SOFT_BREAK.finditer(self.buffer):
+                last_break = match
+            if last_break is not None and last_break.end() >= self.min_chars:
+                return self._cut(last_break.end())
+        return None
+    
+    def _cut(self, end: int) -> str:
+        sentence = self.buffer[:end].strip()
+        self.buffer = self.buffer[end:]
+        return sentence
\ No newline at end of file
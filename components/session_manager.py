@@ -13,6 +13,12 @@ class SessionManager:
         self.session_id = str(uuid.uuid4())  # Create initial session
         self.last_user_activity = time.time()
         
+        # Resume the last stored session after a restart if it has not timed out
+        latest = self.memory.get_latest_session()
+        if latest is not None and time.time() - latest[1] <= self.session_timeout:
+            self.session_id, self.last_user_activity = latest
+            print(f"Resumed session {self.session_id}")
+        
         # Phrases that indicate end of session
         self.end_phrases = config.get("session_end_phrases", [
             "再见", "拜拜", "bye", "goodbye", "结束对话", "结束聊天", 
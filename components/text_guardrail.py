@@ -1,5 +1,5 @@
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class TextGuardrail:
     """
@@ -58,7 +58,7 @@ class TextGuardrail:
         # Check language support
         detected_lang = self.detect_language(text)
         if detected_lang not in self.supported_languages:
-            return False, f"Unsupported language detected: {detected_lang}. Only Chinese and English are supported."
+            return False, self._unsupported_language_message(detected_lang)
         
         # Check for potentially unsafe content patterns
         # This is a simplified example - in a real implementation, you might connect to a content moderation API
@@ -69,6 +69,17 @@ class TextGuardrail:
         
         return True, "Content is compliant"
     
+    def _unsupported_language_message(self, language: str) -> str:
+        return f"Unsupported language detected: {language}. Only Chinese and English are supported."
+    
+    def warning_messages(self) -> List[str]:
+        """
+        Fixed warning messages that can be spoken in place of rejected text
+        """
+        # detect_language only ever returns 'zh' or 'en'
+        return [self._unsupported_language_message(language)
+                for language in ('zh', 'en') if language not in self.supported_languages]
+    
     def validate_and_clean(self, text: str) -> tuple[bool, str, str]:
         """
         Validate text and return cleaned version if compliant
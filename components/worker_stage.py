@@ -0,0 +1,90 @@
+import queue
+import threading
+from typing import Any, Callable, Dict
+
+class WorkerStage:
+    """
+    Bounded queue drained by a pool of worker threads, so the producer
+    never blocks on the work being done downstream
+    """
+    def __init__(self, name: str, handler: Callable[[Any], None], num_workers: int = 1,
+                 max_queue_size: int = 4, drop_oldest: bool = True):
+        self.name = name
+        self.handler = handler
+        self.num_workers = max(1, num_workers)
+        # When full, either evict the oldest queued item or reject the new one
+        self.drop_oldest = drop_oldest
+        # The bound applies to droppable items only, so control items always fit
+        self.max_queue_size = max_queue_size
+        self.queue: queue.Queue = queue.Queue()
+        self.workers = []
+        self._stop_marker = object()
+        self._stats_lock = threading.Lock()
+        self.stats = {
+            "submitted": 0,
+            "processed": 0,
+            "dropped": 0,
+            "errors": 0,
+            "max_queue_depth": 0,
+        }
+    
+    def start(self):
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"{self.name}-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+    
+    def stop(self, timeout: float = 5.0):
+        for _ in self.workers:
+            # Blocking put is fine here, workers are still draining the queue
+            self.queue.put(self._stop_marker)
+        for worker in self.workers:
+            worker.join(timeout)
+        self.workers = []
+    
+    def submit(self, item: Any, droppable: bool = True) -> bool:
+        """
+        Enqueue an item without blocking. Returns False if an item had to be dropped.
+        Items submitted with droppable=False are never rejected; only use them with
+        drop_oldest=False, since evicting the oldest item could otherwise remove one.
+        """
+        dropped = False
+        while droppable and self.queue.qsize() >= self.max_queue_size:
+            dropped = True
+            self._count("dropped")
+            if not self.drop_oldest:
+                print(f"[{self.name}] queue full, dropping new item")
+                return False
+            try:
+                self.queue.get_nowait()
+                print(f"[{self.name}] queue full, dropped oldest item")
+            except queue.Empty:
+                break
+        
+        self.queue.put_nowait(item)
+        self._count("submitted")
+        with self._stats_lock:
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], self.queue.qsize())
+        return not dropped
+    
+    def get_stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["queue_depth"] = self.queue.qsize()
+        return stats
+    
+    def _count(self, key: str):
+        with self._stats_lock:
+            self.stats[key] += 1
+    
+    def _worker_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is self._stop_marker:
+                break
+            try:
+                self.handler(item)
+                self._count("processed")
+            except Exception as e:
+                self._count("errors")
+                print(f"[{self.name}] worker error: {e}")
\ No newline at end of file
@@ -10,6 +10,12 @@ def get_config():
         "llm_model": "qwen-plus",
         "vlm_model": "qwen-vl-plus",
         "asr_model": "iic/SenseVoiceSmall",
+        "asr_streaming": False,  # decode while the user speaks using asr_streaming_model
+        "asr_streaming_model": "paraformer-zh-streaming",
+        "asr_streaming_chunk_size": [0, 10, 5],  # 600ms decoding steps
+        "asr_streaming_encoder_look_back": 4,
+        "asr_streaming_decoder_look_back": 1,
+        "asr_streaming_batch_fallback": True,  # also load asr_model to decode utterances the stream missed
         
         # Base URLs
         "llm_base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
@@ -22,9 +28,25 @@ def get_config():
         "tts_voice": "zh-CN-XiaoxiaoNeural",
         "tts_rate": "+0%",
         "tts_volume": "+0%",
+        "tts_sentence_min_chars": 4,   # merge shorter sentences into the next one
+        "tts_sentence_max_chars": 60,  # break at a comma when no sentence end appears
+        "tts_cache_enabled": True,
+        "tts_cache_dir": "./tts_cache",
+        "tts_cache_max_bytes": 50 * 1024 * 1024,  # least recently used audio is evicted above this size
+        # Replies synthesized at startup so they play without a network round trip
+        # (matched ignoring trailing punctuation; guardrail warnings are added automatically)
+        "tts_cache_phrases": ["好的", "请稍等", "我在", "抱歉，我没有听清楚", "抱歉，网络出现问题，请稍后再试"],
         
         # Memory settings
         "memory_max_turns": 100,
+        "memory_max_sessions": 20,           # least recently used sessions beyond this are evicted
+        "memory_session_ttl": 24 * 3600,     # sessions idle for this many seconds are evicted
+        "memory_store_path": None,           # SQLite file for persistent history, e.g. "./memory.db"; None keeps memory only
+        "memory_store_retention_days": 30,   # stored sessions idle longer than this are deleted by an hourly sweep
+        "memory_token_budget": 2000,             # estimated tokens of history sent with each request
+        "memory_summary_trigger_tokens": 1500,   # fold older turns into a summary above this size
+        "memory_keep_recent_tokens": 600,        # recent turns kept verbatim when summarizing
+        "memory_summary_max_tokens": 300,
         
         # Session settings
         "session_timeout": 20.0,
@@ -35,9 +57,28 @@ def get_config():
         
         # Audio settings
         "audio_player_frequency": 24000,
+        "audio_player_engine": "pcm",          # "pcm" (continuous decode, needs PyAV) or "pygame"
+        "audio_player_buffer_frames": 1024,    # output callback size for the pcm engine
         "audio_recorder_sample_rate": 16000,
         "audio_recorder_chunk_size": 1024,
-        "silence_threshold": 2.0,
+        "silence_threshold": 2.0,  # fixed end-of-turn silence when endpointer_adaptive is off
+        
+        # Adaptive endpointer settings (seconds of trailing silence)
+        "endpointer_adaptive": True,
+        "endpointer_min_silence": 0.3,
+        "endpointer_short_silence": 0.5,     # short commands
+        "endpointer_default_silence": 0.9,
+        "endpointer_max_silence": 2.0,       # hesitations and continuation cues
+        "endpointer_short_utterance": 1.5,   # seconds of speech below which a turn is a short command
+        "endpointer_pause_margin": 1.3,      # required silence vs. longest mid-turn pause
+        "endpointer_noise_margin": 2.0,      # energy gate relative to the noise floor
+        "endpointer_final_cue_factor": 0.6,  # shorten the wait after sentence-final particles
+        
+        # Recognition worker settings
+        "recognition_workers": 1,        # threads running speaker verification + ASR
+        "recognition_queue_size": 4,     # pending utterances before the oldest is dropped
+        "asr_stream_queue_size": 256,    # pending audio chunks for streaming ASR
+        "asr_stream_finish_timeout": 5.0,
         
         # VAD settings
         "vad_sample_rate": 16000,
@@ -48,9 +89,23 @@ def get_config():
         "camera_device_index": 0,
         "camera_warmup_frames": 5,
         "camera_warmup_delay": 0.1,
+        "camera_always_on": False,      # keep the device open and hold the latest frame in a background thread
+        "camera_capture_fps": 10,       # frames drained per second in always-on mode
+        "camera_open_timeout": 3.0,     # give up opening the device after this many seconds
+        "camera_idle_release": 60.0,    # release the device after this many seconds without a capture
+        "camera_max_frame_age": 1.0,    # oldest frame (seconds) served by always-on capture
+        "camera_max_edge": 1024,        # longest image edge sent to the VLM, in pixels
+        "camera_jpeg_quality": 85,
+        "camera_grayscale": False,
+        "speculative_capture": True,          # reopen a released camera as soon as the user starts speaking (needs camera_always_on)
+        "speculative_capture_window": 10.0,   # seconds a camera reopened at speech onset stays open without a request
         
         # VLM settings
         "vlm_max_tokens": 1500,
+        "vlm_cache_enabled": True,
+        "vlm_cache_ttl": 30.0,              # seconds a scene description stays valid
+        "vlm_cache_hash_tolerance": 6,      # max differing bits (of 64) for frames to count as the same scene
+        "vlm_cache_max_entries": 32,
         
         # Guardrail settings
         "guardrail_supported_languages": ['zh', 'en'],
@@ -60,9 +115,30 @@ def get_config():
         
         # Speaker verification
         "speaker_verification_voice_path": "./reference_voice.wav",
+        "speaker_verification_extra_voice_paths": [],  # more enrolled speakers, e.g. family members
         "speaker_verification_threshold": 0.35,
         "speaker_verification_model": "iic/speech_campplus_sv_zh-cn_16k-common",
         
         # Search settings
-        "search_timeout": 10
+        "search_timeout": 10,
+        "search_page_fetch_timeout": 5,  # overall deadline for fetching top result pages
+        "search_max_connections": 10,
+        "search_cache_ttl": 600,              # seconds a query result stays fresh
+        "search_cache_max_entries": 128,
+        "search_page_cache_ttl": 3600,        # seconds extracted page text stays fresh
+        "search_page_cache_max_entries": 256,
+        "search_cache_path": None,            # e.g. "./search_cache.json" to persist across restarts
+        "search_cache_save_delay": 5.0,       # seconds to coalesce cache changes before writing the file
+        
+        # Tool settings (seconds before a tool call is abandoned)
+        "tool_timeout": 15.0,
+        "tool_timeouts": {
+            "vision_analysis": 15.0,
+            "web_search": 12.0,
+        },
+        "tool_result_max_chars": 200,   # tool output kept in history; the full output is used for one reply only
+        
+        # Intent router settings (regex rules checked before the routing LLM)
+        "intent_router_enabled": True,
+        "intent_router_shadow_rate": 0.1,   # fraction of locally routed turns re-checked by the LLM to measure accuracy
     }
\ No newline at end of file
@@ -1,4 +1,5 @@
-from typing import List, Dict, Any, Optional
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, AsyncIterator
 from openai import AsyncOpenAI
 from utils.logger import print_timestamp_debug_log
 
@@ -12,15 +13,23 @@ class LLM:
             base_url=config.get("llm_base_url", "https://dashscope.aliyuncs.com/compatible-mode/v1")
         )
         self.model = config.get("llm_model", "qwen-plus")
+        self.summary_max_tokens = config.get("memory_summary_max_tokens", 300)
         # System message to be included in all conversations
         self.system_message = {
             "role": "system", 
             "content": config.get("llm_system_prompt", "你是 小白, 人工智能助手。提供有用的回复，回复精简不超过200个字。")
         }
     
-    async def generate(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
-        # Add system message at the beginning of the conversation
-        messages_with_system = [self.system_message] + messages
+    def _build_params(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None,
+                      summary: str = "") -> Dict[str, Any]:
+        # Add system message at the beginning of the conversation, with the summary of earlier turns
+        system_message = self.system_message
+        if summary:
+            system_message = {
+                "role": "system",
+                "content": f"{self.system_message['content']}\n\n之前对话的摘要：{summary}"
+            }
+        messages_with_system = [system_message, *messages]
         
         params = {
             "model": self.model,
@@ -33,8 +42,75 @@ class LLM:
         if tools:
             params["tools"] = tools
             params["tool_choice"] = "auto"
+        return params
+    
+    async def generate(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None,
+                       summary: str = "") -> Dict[str, Any]:
+        params = self._build_params(messages, tools, summary)
         
         #print_timestamp_debug_log(f"----prompt: {params}")
         response = await self.client.chat.completions.create(**params)
         #print_timestamp_debug_log(f"----response: {response.choices[0].message}")
-        return response.choices[0].message
\ No newline at end of file
+        return response.choices[0].message
+    
+    async def generate_stream(self, messages: List[Dict[str, str]], tools: Optional[List[Dict]] = None,
+                              tool_calls: Optional[list] = None, summary: str = "") -> AsyncIterator[str]:
+        """
+        Stream the reply as text deltas so speech can start before generation ends.
+        Tool calls requested by the model are collected into `tool_calls` when given,
+        with the same attribute layout as the non-streaming response.
+        """
+        params = self._build_params(messages, tools, summary)
+        params["stream"] = True
+        
+        stream = await self.client.chat.completions.create(**params)
+        partial_calls: Dict[int, Dict[str, str]] = {}
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            
+            # Tool call names and arguments arrive in fragments keyed by index
+            for tc in delta.tool_calls or []:
+                index = tc.index if tc.index is not None else 0
+                entry = partial_calls.setdefault(index, {"id": "", "name": "", "arguments": ""})
+                if tc.id:
+                    entry["id"] = tc.id
+                if tc.function:
+                    if tc.function.name and not entry["name"]:
+                        entry["name"] = tc.function.name
+                    if tc.function.arguments:
+                        entry["arguments"] += tc.function.arguments
+            
+            if delta.content:
+                yield delta.content
+        
+        if tool_calls is not None:
+            for index in sorted(partial_calls):
+                entry = partial_calls[index]
+                tool_calls.append(SimpleNamespace(
+                    id=entry["id"],
+                    type="function",
+                    function=SimpleNamespace(name=entry["name"], arguments=entry["arguments"] or "{}")
+                ))
+    
+    async def summarize(self, previous_summary: str, messages: List[Dict[str, Any]]) -> str:
+        """
+        Fold older conversation turns into a running summary
+        """
+        lines = []
+        for message in messages:
+            if message.get("content"):
+                lines.append(f"{message['role']}: {message['content']}")
+        prompt = (
+            "请将之前的摘要和下面的对话合并为一段简洁的摘要，保留用户的信息、偏好和尚未完成的事项，不超过200个字。\n\n"
+            f"之前的摘要：{previous_summary or '无'}\n\n对话：\n" + "\n".join(lines)
+        )
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3,
+            max_tokens=self.summary_max_tokens,
+            extra_body={"enable_thinking": False},
+        )
+        return response.choices[0].message.content.strip()
\ No newline at end of file
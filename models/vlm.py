@@ -1,5 +1,9 @@
 import base64
-from typing import Dict, Any
+import re
+import time
+import cv2
+import numpy as np
+from typing import Dict, Any, List, Optional, Union
 from openai import AsyncOpenAI
 from datetime import datetime
 from utils.logger import print_timestamp_debug_log
@@ -15,12 +19,73 @@ class VLM:
         )
         self.model = config.get("vlm_model", "qwen-vl-plus")
         self.max_tokens = config.get("vlm_max_tokens", 1500)
+        
+        # Reuse descriptions while the scene has not changed
+        self.cache_enabled = config.get("vlm_cache_enabled", True)
+        self.cache_ttl = config.get("vlm_cache_ttl", 30.0)
+        self.cache_hash_tolerance = config.get("vlm_cache_hash_tolerance", 6)  # differing bits out of 64
+        self.cache_max_entries = config.get("vlm_cache_max_entries", 32)
+        self.cache: List[Dict[str, Any]] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    @staticmethod
+    def _frame_hash(image_data: bytes) -> Optional[int]:
+        """
+        64-bit difference hash of a JPEG image, robust to noise and small exposure changes
+        """
+        # Decoding at reduced size is much cheaper than a full decode
+        frame = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+        if frame is None:
+            return None
+        small = cv2.resize(frame, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        return int.from_bytes(np.packbits(bits).tobytes(), "big")
+    
+    @staticmethod
+    def _normalize_prompt(prompt: str) -> str:
+        return re.sub(r"[\s\W_]+", " ", prompt.lower()).strip()
+    
+    def _cache_lookup(self, frame_hash: int, prompt: str) -> Optional[str]:
+        now = time.time()
+        self.cache = [entry for entry in self.cache if now - entry["time"] <= self.cache_ttl]
+        for entry in self.cache:
+            if entry["prompt"] != prompt:
+                continue
+            distance = bin(entry["hash"] ^ frame_hash).count("1")
+            if distance <= self.cache_hash_tolerance:
+                print_timestamp_debug_log(f"VLM cache hit (hash distance {distance})")
+                return entry["result"]
+        return None
     
-    async def analyze(self, image_path: str, prompt: str) -> str:
-        # Read and encode image
-        with open(image_path, "rb") as f:
-            image_data = f.read()
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+    def _cache_store(self, frame_hash: int, prompt: str, result: str):
+        self.cache.append({"hash": frame_hash, "prompt": prompt, "result": result, "time": time.time()})
+        if len(self.cache) > self.cache_max_entries:
+            self.cache.pop(0)
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "entries": len(self.cache)}
+    
+    async def analyze(self, image: Union[str, bytes], prompt: str) -> str:
+        # Accept encoded JPEG bytes directly, or read the image from a path
+        if isinstance(image, (bytes, bytearray)):
+            image_data = image
+        else:
+            with open(image, "rb") as f:
+                image_data = f.read()
+        
+        frame_hash = None
+        if self.cache_enabled:
+            frame_hash = self._frame_hash(image_data)
+            normalized_prompt = self._normalize_prompt(prompt)
+            if frame_hash is not None:
+                cached = self._cache_lookup(frame_hash, normalized_prompt)
+                if cached is not None:
+                    self.cache_hits += 1
+                    return cached
+                self.cache_misses += 1
+        
+        image_base64 = base64.b64encode(image_data).decode('utf-8')
         
         # Create messages in the format expected by the OpenAI API
         messages = [
@@ -48,4 +113,7 @@ class VLM:
             max_tokens=self.max_tokens
         )
         #print_timestamp_debug_log(f"---VLM response:{response.choices[0].message.content}")
-        return response.choices[0].message.content
\ No newline at end of file
+        result = response.choices[0].message.content
+        if frame_hash is not None:
+            self._cache_store(frame_hash, normalized_prompt, result)
+        return result
\ No newline at end of file
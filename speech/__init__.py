@@ -1,6 +1,8 @@
 from .asr import ASR
 from .vad import VAD
 from .tts import TTS
+from .tts_cache import TTSCache
 from .speaker_verification import SpeakerVerification
+from .endpointer import Endpointer
 
-__all__ = ['ASR', 'VAD', 'TTS', 'SpeakerVerification']
\ No newline at end of file
+__all__ = ['ASR', 'VAD', 'TTS', 'TTSCache', 'SpeakerVerification', 'Endpointer']
\ No newline at end of file
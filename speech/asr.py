@@ -1,39 +1,98 @@
-import os
-import tempfile
-import wave
+import numpy as np
 from typing import Dict, Any
 from funasr import AutoModel
+from utils.pcm import PCMData, pcm_to_float32
 
 class ASR:
     """
-    Automatic Speech Recognition using SenseVoiceSmall model
+    Automatic Speech Recognition using SenseVoiceSmall model,
+    or an incremental streaming model when asr_streaming is enabled
     """
     def __init__(self, config: Dict[str, Any]):
-        # Remove the remote_code parameter which was causing the error
-        model_name = config.get("asr_model", "iic/SenseVoiceSmall")
-        self.model = AutoModel(model=model_name, trust_remote_code=True)
+        self.sample_rate = config.get("audio_recorder_sample_rate", 16000)
+        
+        # Streaming mode decodes audio while the user is still speaking
+        self.streaming = config.get("asr_streaming", False)
+        self.chunk_size = config.get("asr_streaming_chunk_size", [0, 10, 5])  # [0, 10, 5] -> 600ms per step
+        self.encoder_look_back = config.get("asr_streaming_encoder_look_back", 4)
+        self.decoder_look_back = config.get("asr_streaming_decoder_look_back", 1)
+        # Each chunk_size unit is 60ms of audio
+        self.chunk_stride = int(self.chunk_size[1] * 0.06 * self.sample_rate)
+        
+        # Batch model for whole utterances; in streaming mode it is only the fallback for
+        # utterances the streaming decoder could not finish or did not receive in full
+        self.model = None
+        if not self.streaming or config.get("asr_streaming_batch_fallback", True):
+            # Remove the remote_code parameter which was causing the error
+            self.model = AutoModel(model=config.get("asr_model", "iic/SenseVoiceSmall"), trust_remote_code=True)
+        self.stream_model = None
+        if self.streaming:
+            self.stream_model = AutoModel(model=config.get("asr_streaming_model", "paraformer-zh-streaming"),
+                                          trust_remote_code=True)
+        
+        # Streaming decoder state
+        self.stream_cache: Dict[str, Any] = {}
+        self.stream_pending = np.zeros(0, dtype=np.float32)
+        self.partial_text = ""
     
-    def transcribe(self, audio_data: bytes) -> str:
-        # Create a temporary WAV file
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            temp_filename = tmp_file.name
-            
-        try:
-            # Write audio data to temporary WAV file
-            with wave.open(temp_filename, 'wb') as wf:
-                wf.setnchannels(1)  # Mono
-                wf.setsampwidth(2)  # 16 bits
-                wf.setframerate(16000)  # 16kHz
-                wf.writeframes(audio_data)
-            
-            # Transcribe using SenseVoiceSmall model with the temporary file
-            result = self.model.generate(input=temp_filename, 
-                                         cache={}, 
-                                         language="auto", # "zh", "en", "yue", "ja", "ko", "nospeech"
-                                         use_itn=True)
-            
-            return result[0]['text']
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_filename):
-                os.unlink(temp_filename)
\ No newline at end of file
+    def transcribe(self, audio_data: PCMData) -> str:
+        """
+        Transcribe 16-bit mono PCM, given as raw bytes / memoryview or as an
+        int16 or float32 NumPy array, entirely in memory
+        """
+        if self.model is None:
+            raise RuntimeError("batch ASR model not loaded (asr_streaming_batch_fallback is off)")
+        audio = pcm_to_float32(audio_data)
+        if audio.size == 0:
+            return ""
+        
+        # Transcribe using SenseVoiceSmall model directly from the sample array
+        result = self.model.generate(input=audio, 
+                                     fs=self.sample_rate,
+                                     cache={}, 
+                                     language="auto", # "zh", "en", "yue", "ja", "ko", "nospeech"
+                                     use_itn=True)
+        
+        return result[0]['text'] if result else ""
+    
+    def start_stream(self):
+        """
+        Reset decoder state at the start of an utterance
+        """
+        self.stream_cache = {}
+        self.stream_pending = np.zeros(0, dtype=np.float32)
+        self.partial_text = ""
+    
+    def feed_stream(self, audio_data: PCMData) -> str:
+        """
+        Feed captured audio and return the partial hypothesis so far.
+        The model only runs once a full decoding chunk has accumulated.
+        """
+        self.stream_pending = np.concatenate([self.stream_pending, pcm_to_float32(audio_data)])
+        while len(self.stream_pending) >= self.chunk_stride:
+            chunk = self.stream_pending[:self.chunk_stride]
+            self.stream_pending = self.stream_pending[self.chunk_stride:]
+            self._decode_chunk(chunk, is_final=False)
+        return self.partial_text
+    
+    def finish_stream(self) -> str:
+        """
+        Flush the remaining audio and return the final transcript
+        """
+        self._decode_chunk(self.stream_pending, is_final=True)
+        self.stream_pending = np.zeros(0, dtype=np.float32)
+        text = self.partial_text
+        self.stream_cache = {}
+        return text
+    
+    def _decode_chunk(self, chunk: np.ndarray, is_final: bool):
+        # Decoder state carries over between calls through the shared cache
+        result = self.stream_model.generate(input=chunk,
+                                            fs=self.sample_rate,
+                                            cache=self.stream_cache,
+                                            is_final=is_final,
+                                            chunk_size=self.chunk_size,
+                                            encoder_chunk_look_back=self.encoder_look_back,
+                                            decoder_chunk_look_back=self.decoder_look_back)
+        if result and result[0].get('text'):
+            self.partial_text += result[0]['text']
\ No newline at end of file
@@ -0,0 +1,123 @@
+import numpy as np
+from typing import Dict, Any, List
+from utils.logger import print_timestamp_debug_log
+
+class Endpointer:
+    """
+    Adaptive end-of-turn detection over classified VAD frames.
+    The trailing silence needed to close a turn adapts to the utterance length,
+    the pauses the speaker has already made, the background noise floor and,
+    when streaming ASR is on, cues at the end of the partial transcript.
+    """
+    def __init__(self, config: Dict[str, Any]):
+        self.sample_rate = config.get("audio_recorder_sample_rate", 16000)
+        self.frame_size = int(config.get("vad_sample_rate", 16000) * config.get("vad_frame_duration", 30) / 1000)
+        self.adaptive = config.get("endpointer_adaptive", True)
+        
+        # Required trailing silence in seconds
+        self.fixed_silence = config.get("silence_threshold", 2.0)  # used when adaptive is off
+        self.min_silence = config.get("endpointer_min_silence", 0.3)
+        self.short_silence = config.get("endpointer_short_silence", 0.5)
+        self.default_silence = config.get("endpointer_default_silence", 0.9)
+        self.max_silence = config.get("endpointer_max_silence", 2.0)
+        # Utterances with less speech than this are treated as short commands
+        self.short_utterance = config.get("endpointer_short_utterance", 1.5)
+        # A turn only ends after a silence this much longer than the longest pause so far
+        self.pause_margin = config.get("endpointer_pause_margin", 1.3)
+        # Chunks quieter than noise floor * margin count as silence even if VAD says speech
+        self.noise_margin = config.get("endpointer_noise_margin", 2.0)
+        self.final_cue_factor = config.get("endpointer_final_cue_factor", 0.6)
+        self.final_cues = config.get("endpointer_final_cues", [
+            "。", "？", "！", "?", "!", ".", "吗", "呢", "吧", "了", "啊", "呀", "谢谢", "thanks", "please"
+        ])
+        self.continuation_cues = config.get("endpointer_continuation_cues", [
+            "，", ",", "嗯", "呃", "那个", "然后", "还有", "和", "就是", "um", "uh", "and", "the"
+        ])
+        
+        self.noise_floor = None  # RMS of background audio, tracked while idle
+        self.start()
+    
+    def start(self):
+        """
+        Reset per-utterance state
+        """
+        self.speech_samples = 0
+        self.silence_samples = 0
+        self.longest_pause = 0
+    
+    def observe_noise(self, data: bytes):
+        """
+        Track the background noise floor from chunks captured while nobody is speaking
+        """
+        rms = self._rms(data)
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        else:
+            self.noise_floor = 0.95 * self.noise_floor + 0.05 * rms
+    
+    def update(self, data: bytes, frames: List[bool], partial_text: str = "") -> bool:
+        """
+        Account for one captured chunk and return True when the turn has ended
+        """
+        # Energy gate: VAD speech barely above the noise floor is treated as silence
+        if self.adaptive and self.noise_floor is not None and any(frames):
+            if self._rms(data) < self.noise_floor * self.noise_margin:
+                frames = [False] * len(frames)
+        
+        for frame_is_speech in frames:
+            if frame_is_speech:
+                # A pause just ended, remember how long the speaker paused mid-turn
+                if self.speech_samples and self.silence_samples:
+                    self.longest_pause = max(self.longest_pause, self.silence_samples)
+                self.silence_samples = 0
+                self.speech_samples += self.frame_size
+            else:
+                self.silence_samples += self.frame_size
+        
+        if self.silence_samples == 0:
+            return False
+        
+        required, reason = self.required_silence(partial_text)
+        silence = self.silence_samples / self.sample_rate
+        if silence < required:
+            return False
+        
+        print_timestamp_debug_log(
+            f"Endpoint: speech={self.speech_samples / self.sample_rate:.2f}s, silence={silence:.2f}s, "
+            f"required={required:.2f}s ({reason}), longest_pause={self.longest_pause / self.sample_rate:.2f}s, "
+            f"noise_floor={self.noise_floor}, partial='{partial_text}'"
+        )
+        return True
+    
+    def required_silence(self, partial_text: str = "") -> tuple:
+        """
+        Trailing silence in seconds needed to end the current turn, and why
+        Returns (seconds, reason)
+        """
+        if not self.adaptive:
+            return self.fixed_silence, "fixed"
+        
+        speech = self.speech_samples / self.sample_rate
+        if speech < self.short_utterance:
+            required, reason = self.short_silence, "short"
+        else:
+            required, reason = self.default_silence, "default"
+        
+        # Transcript cues: hesitations wait longest, sentence-final particles close early
+        text = partial_text.strip().lower()
+        if text:
+            if any(text.endswith(cue) for cue in self.continuation_cues):
+                required, reason = self.max_silence, "continuation cue"
+            elif any(text.endswith(cue) for cue in self.final_cues):
+                required, reason = required * self.final_cue_factor, "final cue"
+        
+        # Never close inside a pause no longer than ones the speaker already made
+        pause_bound = self.pause_margin * self.longest_pause / self.sample_rate
+        if pause_bound > required:
+            required, reason = pause_bound, f"{reason}, pause history"
+        
+        return min(max(required, self.min_silence), self.max_silence), reason
+    
+    def _rms(self, data: bytes) -> float:
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.mean(samples * samples))) if samples.size else 0.0
\ No newline at end of file
@@ -1,20 +1,32 @@
 import os
-import tempfile
-import wave
-from typing import Dict, Any
+import re
+import numpy as np
+from typing import Dict, Any, List, Optional
 from modelscope.pipelines import pipeline
 from modelscope.utils.constant import Tasks
+from utils.pcm import PCMData, pcm_to_float32
 
 class SpeakerVerification:
     """
-    Speaker verification using voiceprint comparison
+    Speaker verification using voiceprint comparison.
+    Enrolled voiceprints are embedded once and cached next to their reference files;
+    each utterance is then embedded once and scored against all speakers in one pass.
     """
     def __init__(self, config: Dict[str, Any]):
         self.registered_voice_path = config.get("speaker_verification_voice_path", "")
+        # Additional enrolled speakers (e.g. other household members)
+        self.extra_voice_paths = config.get("speaker_verification_extra_voice_paths", [])
         self.threshold = config.get("speaker_verification_threshold", 0.5)
         self.model_name = config.get("speaker_verification_model", "iic/speech_campplus_sv_zh-cn_16k-common")
         self.model = None
         
+        # Enrolled speakers: one L2-normalized embedding per row
+        self.speaker_names: List[str] = []
+        self.speaker_embeddings: Optional[np.ndarray] = None
+        self.last_speaker: Optional[str] = None
+        # Set when reference files exist but none could be enrolled; utterances are then rejected
+        self.enrollment_failed = False
+        
         # Try to initialize the speaker verification model
         try:
             # Use modelscope.pipelines to load the speaker verification model
@@ -22,48 +34,101 @@ class SpeakerVerification:
         except Exception as e:
             print(f"Warning: Could not load speaker verification model: {e}")
             print("Speaker verification will be skipped.")
+        
+        if self.model is not None:
+            self._load_enrolled_speakers()
     
-    def verify(self, audio_data: bytes) -> bool:
+    def _embed(self, audio) -> np.ndarray:
         """
-        Verify if the audio matches the registered speaker
+        Compute the L2-normalized speaker embedding of a file path or sample array
         """
-        # If no registered voice path is provided or model failed to load, skip verification
-        if not self.registered_voice_path or not os.path.exists(self.registered_voice_path):
-            print("Speaker verification: No registered voice file found, skipping verification")
-            return True
+        result = self.model([audio], output_emb=True)
+        embedding = np.asarray(result["embs"], dtype=np.float32).reshape(-1)
+        return embedding / (np.linalg.norm(embedding) + 1e-10)
+    
+    def _embedding_path(self, voice_path: str) -> str:
+        # Cached embedding lives next to the reference file, tagged with the model that produced it
+        model_tag = re.sub(r"[^A-Za-z0-9]+", "_", self.model_name).strip("_")
+        return f"{os.path.splitext(voice_path)[0]}.{model_tag}.emb.npy"
+    
+    def _load_enrolled_speakers(self, refresh: bool = False):
+        """
+        Load cached reference embeddings, computing and persisting any that are missing or stale.
+        With refresh=True every reference is embedded again.
+        """
+        voice_paths = [self.registered_voice_path] + list(self.extra_voice_paths)
+        names, embeddings = [], []
+        reference_count = 0
+        for voice_path in dict.fromkeys(voice_paths):
+            if not voice_path or not os.path.exists(voice_path):
+                continue
+            reference_count += 1
             
-        # If model failed to load, skip verification
-        if self.model is None:
-            print("Speaker verification: Model not available, skipping verification")
+            embedding_path = self._embedding_path(voice_path)
+            try:
+                if (not refresh and os.path.exists(embedding_path)
+                        and os.path.getmtime(embedding_path) >= os.path.getmtime(voice_path)):
+                    embedding = np.load(embedding_path)
+                else:
+                    embedding = self._embed(voice_path)
+                    np.save(embedding_path, embedding)
+                    print(f"Speaker verification: cached reference embedding at {embedding_path}")
+            except Exception as e:
+                print(f"Speaker verification: could not enroll {voice_path}: {e}")
+                continue
+            
+            # Embeddings of different sizes cannot be scored together
+            if embeddings and embedding.shape != embeddings[0].shape:
+                print(f"Speaker verification: embedding size of {voice_path} does not match, skipping it")
+                continue
+            names.append(os.path.splitext(os.path.basename(voice_path))[0])
+            embeddings.append(embedding)
+        
+        self.speaker_names = names
+        self.speaker_embeddings = np.stack(embeddings) if embeddings else None
+        self.enrollment_failed = reference_count > 0 and not embeddings
+        if self.enrollment_failed:
+            print("Speaker verification: no reference voice could be enrolled, utterances will be rejected")
+    
+    def verify(self, audio_data: PCMData) -> bool:
+        """
+        Verify if the audio matches any registered speaker
+        """
+        self.last_speaker = None
+        
+        # Reference voices exist but could not be enrolled: do not fall back to accepting everyone
+        if self.enrollment_failed:
+            print("Speaker verification: enrollment failed, rejecting utterance")
+            return False
+        
+        # If no registered voice is available, skip verification
+        if self.speaker_embeddings is None:
+            if self.model is None:
+                print("Speaker verification: Model not available, skipping verification")
+            else:
+                print("Speaker verification: No registered voice file found, skipping verification")
             return True
         
-        # Create a temporary WAV file for the input audio
-        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-            temp_filename = tmp_file.name
-            
         try:
-            # Write audio data to temporary WAV file
-            with wave.open(temp_filename, 'wb') as wf:
-                wf.setnchannels(1)  # Mono
-                wf.setsampwidth(2)  # 16 bits
-                wf.setframerate(16000)  # 16kHz
-                wf.writeframes(audio_data)
-            
-            # Perform speaker verification
-            result = self.model([temp_filename, self.registered_voice_path])
+            # One embedding for the utterance, cosine similarity against every enrolled speaker
+            embedding = self._embed(pcm_to_float32(audio_data))
+            if embedding.shape[0] != self.speaker_embeddings.shape[1]:
+                # Cached references came from a different model; enroll them again with this one
+                print("Speaker verification: reference embeddings do not match the model, re-enrolling")
+                self._load_enrolled_speakers(refresh=True)
+                if self.speaker_embeddings is None or embedding.shape[0] != self.speaker_embeddings.shape[1]:
+                    return False
+            scores = self.speaker_embeddings @ embedding
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            is_same_spk = score >= self.threshold
             
-            # Extract similarity score
-            score = result["score"]
-            is_same_spk = result["decision"] if "decision" in result else (score >= self.threshold)
-            
-            print(f"Speaker verification: score={score}, decision={is_same_spk}")
+            print(f"Speaker verification: speaker={self.speaker_names[best]}, score={score}, decision={is_same_spk}")
             
+            if is_same_spk:
+                self.last_speaker = self.speaker_names[best]
             return is_same_spk
         except Exception as e:
             print(f"Speaker verification error: {e}")
             # In case of error, we'll allow processing to continue
-            return True
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_filename):
-                os.unlink(temp_filename)
\ No newline at end of file
+            return True
\ No newline at end of file
@@ -1,16 +1,56 @@
+import asyncio
 import edge_tts
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional
 from components.text_guardrail import TextGuardrail
+from .tts_cache import TTSCache
 
 class TTS:
     """
-    Text-to-Speech using Edge-TTS with guardrail
+    Text-to-Speech using Edge-TTS with guardrail and an on-disk audio cache
     """
     def __init__(self, config: Dict[str, Any]):
         self.voice = config.get("tts_voice", "zh-CN-XiaoxiaoNeural")
         self.rate = config.get("tts_rate", "+0%")
         self.volume = config.get("tts_volume", "+0%")
         self.guardrail = TextGuardrail(config)
+        self.cache = TTSCache(config) if config.get("tts_cache_enabled", True) else None
+    
+    async def stream(self, text: str, voice: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Stream MP3 audio for already validated text. Cached audio is returned at once;
+        otherwise audio is streamed from edge-tts and stored once complete.
+        """
+        voice = voice or self.voice
+        key = None
+        if self.cache is not None:
+            key = TTSCache.make_key(text, voice, self.rate, self.volume)
+            # Cache file I/O stays off the event loop
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                yield cached
+                return
+        
+        communicate = edge_tts.Communicate(text, voice, rate=self.rate, volume=self.volume)
+        chunks = []
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                chunks.append(chunk["data"])
+                yield chunk["data"]
+        
+        # Only complete syntheses are cached
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, b"".join(chunks))
+    
+    async def presynthesize(self, phrases: List[tuple]):
+        """
+        Fill the cache for (text, voice) pairs that are known to be spoken often
+        """
+        for text, voice in phrases:
+            try:
+                async for _ in self.stream(text, voice):
+                    pass
+            except Exception as e:
+                print(f"TTS pre-synthesis failed for '{text}': {e}")
     
     async def synthesize(self, text: str) -> bytes:
         # Validate and clean text before synthesis
@@ -20,14 +60,13 @@ class TTS:
             # If validation fails, synthesize the error message instead
             print(f"TTS Guardrail Warning: {message}")
             # Use the message to inform the user about the issue
-            communicate = edge_tts.Communicate(message, self.voice, rate=self.rate, volume=self.volume)
+            text_to_speak = message
         else:
             # If validation passes, use the cleaned text
             print(f"TTS Guardrail: {message}")
-            communicate = edge_tts.Communicate(cleaned_text, self.voice, rate=self.rate, volume=self.volume)
+            text_to_speak = cleaned_text
         
         audio_data = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_data += chunk["data"]
+        async for chunk in self.stream(text_to_speak):
+            audio_data += chunk
         return audio_data
\ No newline at end of file
@@ -0,0 +1,115 @@
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache of synthesized speech.
+    Files are named by a hash of (voice, rate, volume, text) and evicted least
+    recently used first once the cache exceeds its size limit. Methods do blocking
+    file I/O, so call them from a worker thread.
+    """
+    # Sentence splitting keeps trailing punctuation, which should not change the key
+    TRAILING_PUNCTUATION = "。．.！!？?，,；;：:、…~～ "
+    
+    def __init__(self, config: Dict[str, Any]):
+        self.cache_dir = config.get("tts_cache_dir", "./tts_cache")
+        self.max_bytes = config.get("tts_cache_max_bytes", 50 * 1024 * 1024)
+        self.entries: "OrderedDict[str, int]" = OrderedDict()  # key -> file size, oldest first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()  # get/put may run concurrently in worker threads
+        
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_index()
+        except OSError as e:
+            print(f"Warning: TTS cache disabled, could not use {self.cache_dir}: {e}")
+            self.cache_dir = None
+    
+    def _load_index(self):
+        # Rebuild LRU order from file modification times
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".mp3"):
+                stat = os.stat(os.path.join(self.cache_dir, name))
+                files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.total_bytes += size
+    
+    @classmethod
+    def normalize_text(cls, text: str) -> str:
+        return re.sub(r"\s+", " ", text).strip().rstrip(cls.TRAILING_PUNCTUATION)
+    
+    @classmethod
+    def make_key(cls, text: str, voice: str, rate: str, volume: str) -> str:
+        text = cls.normalize_text(text)
+        return hashlib.sha256(f"{voice}|{rate}|{volume}|{text}".encode("utf-8")).hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.mp3")
+    
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            if self.cache_dir is None or key not in self.entries:
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "rb") as f:
+                    audio = f.read()
+                # Bump the modification time so LRU order survives restarts
+                os.utime(self._path(key))
+            except OSError:
+                self._remove(key)
+                self.misses += 1
+                return None
+            
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return audio
+    
+    def put(self, key: str, audio: bytes):
+        if self.cache_dir is None or not audio:
+            return
+        with self.lock:
+            try:
+                # Write to a temp file first so a crash never leaves a truncated entry
+                temp_path = f"{self._path(key)}.tmp"
+                with open(temp_path, "wb") as f:
+                    f.write(audio)
+                os.replace(temp_path, self._path(key))
+            except OSError as e:
+                print(f"Warning: could not write TTS cache entry: {e}")
+                return
+            
+            if key in self.entries:
+                self.total_bytes -= self.entries[key]
+            self.entries[key] = len(audio)
+            self.entries.move_to_end(key)
+            self.total_bytes += len(audio)
+            
+            # Evict least recently used entries
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                oldest = next(iter(self.entries))
+                self._remove(oldest)
+    
+    def _remove(self, key: str):
+        size = self.entries.pop(key, 0)
+        self.total_bytes -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+    
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self.entries),
+            "total_bytes": self.total_bytes,
+        }
\ No newline at end of file
@@ -1,5 +1,5 @@
 import webrtcvad
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 class VAD:
     """
@@ -19,6 +19,58 @@ class VAD:
         # Validate frame duration
         if self.frame_duration not in [10, 20, 30]:
             raise ValueError("Frame duration must be 10, 20, or 30 ms")
+        
+        # Partial frame carried over between captured chunks, reused for the whole stream
+        self.frame_bytes = self.frame_size * 2  # 2 bytes per sample (16-bit)
+        self._pending = bytearray(self.frame_bytes)
+        self._pending_len = 0
+    
+    def reset(self):
+        """
+        Drop any partial frame carried over from the previous chunk
+        """
+        self._pending_len = 0
+    
+    def process_chunk(self, chunk: bytes) -> List[bool]:
+        """
+        Split a captured chunk into exact VAD frames and classify each frame once.
+        Samples that do not fill a whole frame are kept and completed by the next chunk,
+        so every sample of the stream is classified exactly once.
+        """
+        view = memoryview(chunk)
+        results = []
+        offset = 0
+        
+        # Complete the frame left over from the previous chunk
+        if self._pending_len:
+            take = min(self.frame_bytes - self._pending_len, len(view))
+            self._pending[self._pending_len:self._pending_len + take] = view[:take]
+            self._pending_len += take
+            offset = take
+            if self._pending_len < self.frame_bytes:
+                return results
+            results.append(self._classify(bytes(self._pending)))
+            self._pending_len = 0
+        
+        # Whole frames straight from the chunk
+        while len(view) - offset >= self.frame_bytes:
+            results.append(self._classify(bytes(view[offset:offset + self.frame_bytes])))
+            offset += self.frame_bytes
+        
+        # Keep the remainder for the next chunk
+        remainder = len(view) - offset
+        if remainder:
+            self._pending[:remainder] = view[offset:]
+            self._pending_len = remainder
+        return results
+    
+    def _classify(self, frame: bytes) -> bool:
+        # webrtcvad only accepts immutable bytes of exactly one frame
+        try:
+            return self.vad.is_speech(frame, self.sample_rate)
+        except Exception:
+            # If VAD fails, assume it's not speech
+            return False
     
     def is_speech(self, audio_frame: bytes) -> bool:
         # Check if frame size is correct
@@ -1,9 +1,58 @@
-import requests
+import asyncio
+import httpx
+import json
+import os
 import re
-from typing import Dict, Any, List
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
 from urllib.parse import quote
 from bs4 import BeautifulSoup
 
+class TTLCache:
+    """
+    Bounded LRU cache whose entries expire after a fixed time-to-live
+    """
+    def __init__(self, max_entries: int = 128, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (timestamp, value)
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        
+        # Mark as most recently used
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def put(self, key: str, value: Any, timestamp: Optional[float] = None):
+        self.entries[key] = (timestamp if timestamp is not None else time.time(), value)
+        self.entries.move_to_end(key)
+        # Evict least recently used entries
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+    
+    def to_dict(self) -> Dict[str, list]:
+        now = time.time()
+        return {key: [ts, value] for key, (ts, value) in self.entries.items() if now - ts <= self.ttl}
+    
+    def load_dict(self, data: Dict[str, list]):
+        # Oldest first so the LRU order survives a round trip
+        for key, (ts, value) in sorted(data.items(), key=lambda item: item[1][0]):
+            if time.time() - ts <= self.ttl:
+                self.put(key, value, ts)
+
+# Characters of page text included per search result
+PAGE_SNIPPET_CHARS = 500
+
 class SearchEngine:
     """
     Search engine for retrieving up-to-date information from Baidu and Google
@@ -11,9 +60,100 @@ class SearchEngine:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        self.session = requests.Session()
-        self.session.headers.update({'User-Agent': self.user_agent})
         self.timeout = config.get("search_timeout", 10)
+        self.page_fetch_timeout = config.get("search_page_fetch_timeout", 5)
+        
+        # One pooled async client shared by all searches and page fetches
+        max_connections = config.get("search_max_connections", 10)
+        self.client = httpx.AsyncClient(
+            headers={'User-Agent': self.user_agent},
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True
+        )
+        
+        # Result caches: formatted results by query, extracted page text by URL
+        self.query_cache = TTLCache(config.get("search_cache_max_entries", 128),
+                                    config.get("search_cache_ttl", 600))
+        self.page_cache = TTLCache(config.get("search_page_cache_max_entries", 256),
+                                   config.get("search_page_cache_ttl", 3600))
+        self.cache_path = config.get("search_cache_path")  # optional on-disk persistence
+        self.cache_save_lock = asyncio.Lock()  # one writer of the temp file at a time
+        self.cache_save_delay = config.get("search_cache_save_delay", 5.0)  # seconds
+        self.cache_save_task: Optional[asyncio.Task] = None
+        self._load_cache()
+    
+    def _cache_key(self, query: str, engine: str, num_results: int) -> str:
+        # Normalize case, whitespace and trailing punctuation so rephrasings of the same query hit
+        normalized = re.sub(r'\s+', ' ', query.strip().lower()).rstrip('?？。.!！')
+        return f"{engine.lower()}|{num_results}|{normalized}"
+    
+    def _load_cache(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.query_cache.load_dict(data.get("queries", {}))
+            self.page_cache.load_dict(data.get("pages", {}))
+        except Exception as e:
+            print(f"Warning: Could not load search cache: {e}")
+    
+    def _schedule_cache_save(self):
+        """
+        Save the caches shortly after a change, coalescing bursts of searches into one write
+        """
+        if not self.cache_path:
+            return
+        if self.cache_save_task is None or self.cache_save_task.done():
+            self.cache_save_task = asyncio.create_task(self._save_cache_later())
+    
+    async def _save_cache_later(self):
+        await asyncio.sleep(self.cache_save_delay)
+        await self._persist_cache()
+    
+    async def _persist_cache(self):
+        """
+        Snapshot the caches on the event loop and write the snapshot in a worker thread
+        """
+        if not self.cache_path:
+            return
+        # Taken on the loop, so concurrent searches cannot mutate the caches mid-copy
+        data = {"queries": self.query_cache.to_dict(), "pages": self.page_cache.to_dict()}
+        async with self.cache_save_lock:
+            await asyncio.to_thread(self._save_cache, data)
+    
+    def _save_cache(self, data: Dict[str, Dict[str, list]]):
+        try:
+            # Write to a temp file first so a crash never leaves a truncated cache
+            temp_path = f"{self.cache_path}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        except Exception as e:
+            print(f"Warning: Could not save search cache: {e}")
+    
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Cache hit/miss counters and current sizes
+        """
+        return {
+            "query_hits": self.query_cache.hits,
+            "query_misses": self.query_cache.misses,
+            "query_entries": len(self.query_cache.entries),
+            "page_hits": self.page_cache.hits,
+            "page_misses": self.page_cache.misses,
+            "page_entries": len(self.page_cache.entries),
+        }
+    
+    async def close(self):
+        """
+        Close the pooled HTTP client, writing any pending cache save first
+        """
+        if self.cache_save_task is not None and not self.cache_save_task.done():
+            self.cache_save_task.cancel()
+            await self._persist_cache()
+        await self.client.aclose()
     
     def _extract_main_content(self, html: str) -> str:
         """
@@ -79,7 +219,7 @@ class SearchEngine:
         text = text.strip()
         return text
     
-    def _search_baidu(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+    async def _search_baidu(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """
         Search using Baidu search
         """
@@ -87,7 +227,8 @@ class SearchEngine:
             # Try to use baidusearch package first
             try:
                 from baidusearch.baidusearch import search as baidu_search
-                results = baidu_search(query, num_results)
+                # The package is synchronous, keep it off the event loop
+                results = await asyncio.to_thread(baidu_search, query, num_results)
                 processed_results = []
                 
                 for item in results:
@@ -118,7 +259,7 @@ class SearchEngine:
             
             # Fallback to web scraping
             search_url = f"https://www.baidu.com/s?wd={quote(query)}&rn={num_results}"
-            response = self.session.get(search_url, timeout=self.timeout)
+            response = await self.client.get(search_url)
             response.encoding = 'utf-8'
             
             soup = BeautifulSoup(response.text, 'html.parser')
@@ -156,7 +297,7 @@ class SearchEngine:
         except Exception as e:
             return [{'title': 'Search Error', 'content': f'Baidu search failed: {str(e)}', 'url': ''}]
     
-    def _search_google(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
+    async def _search_google(self, query: str, num_results: int = 5) -> List[Dict[str, str]]:
         """
         Search using Google search
         """
@@ -166,7 +307,10 @@ class SearchEngine:
                 import googlesearch
                 results = []
                 
-                search_results = googlesearch.search(query, num_results=num_results, advanced=True)
+                # The package is synchronous, keep it off the event loop
+                search_results = await asyncio.to_thread(
+                    lambda: list(googlesearch.search(query, num_results=num_results, advanced=True))
+                )
                 for result in search_results:
                     if hasattr(result, 'title') and hasattr(result, 'description') and hasattr(result, 'url'):
                         # SearchResult object
@@ -196,7 +340,7 @@ class SearchEngine:
             
             # Fallback to web scraping (note: Google is hard to scrape, this is just a basic attempt)
             search_url = f"https://www.google.com/search?q={quote(query)}&num={num_results}"
-            response = self.session.get(search_url, timeout=self.timeout)
+            response = await self.client.get(search_url)
             
             soup = BeautifulSoup(response.text, 'html.parser')
             results = []
@@ -233,6 +377,44 @@ class SearchEngine:
         except Exception as e:
             return [{'title': 'Search Error', 'content': f'Google search failed: {str(e)}', 'url': ''}]
     
+    async def _fetch_page_content(self, url: str) -> str:
+        """
+        Download a result page and extract its main text
+        """
+        cached = self.page_cache.get(url)
+        if cached is not None:
+            return cached
+        
+        response = await self.client.get(url, timeout=self.page_fetch_timeout)
+        # HTML parsing is CPU bound, keep it off the event loop
+        content = await asyncio.to_thread(self._extract_main_content, response.text)
+        # Clean the extracted content
+        content = self._clean_content_text(content)
+        # Only the first PAGE_SNIPPET_CHARS characters are ever used, so only those are cached
+        content = content[:PAGE_SNIPPET_CHARS]
+        self.page_cache.put(url, content)
+        return content
+    
+    async def _fetch_top_pages(self, urls: Dict[int, str]) -> Dict[int, str]:
+        """
+        Fetch several result pages concurrently under one overall deadline
+        """
+        tasks = {index: asyncio.create_task(self._fetch_page_content(url)) for index, url in urls.items()}
+        if not tasks:
+            return {}
+        
+        done, pending = await asyncio.wait(tasks.values(), timeout=self.page_fetch_timeout)
+        for task in pending:
+            task.cancel()
+        
+        contents = {}
+        for index, task in tasks.items():
+            if task in done and task.exception() is None:
+                contents[index] = task.result()
+            else:
+                contents[index] = "Failed to retrieve content"
+        return contents
+    
     async def search(self, query: str, engine: str = "baidu", num_results: int = 5) -> str:
         """
         Perform web search using specified search engine
@@ -240,36 +422,47 @@ class SearchEngine:
         try:
             # mock search
             #return f"found info for query: {query}"
+            cache_key = self._cache_key(query, engine, num_results)
+            cached = self.query_cache.get(cache_key)
+            if cached is not None:
+                print(f"Search cache hit for query: {query}")
+                return cached
+            
             if engine.lower() == "google":
-                results = self._search_google(query, num_results)
+                results = await self._search_google(query, num_results)
             else:
                 # Default to Baidu
-                results = self._search_baidu(query, num_results)
+                results = await self._search_baidu(query, num_results)
             
             if not results:
                 return f"No results found for query: {query}"
             
+            # Try to get detailed content if available and needed, only for top results
+            page_urls = {
+                i: result.get('url', '')
+                for i, result in enumerate(results, 1)
+                if result.get('url') and not result.get('content') and i <= 2
+            }
+            page_contents = await self._fetch_top_pages(page_urls)
+            
             # Format results
             formatted_results = []
             for i, result in enumerate(results, 1):
                 title = result.get('title', 'No title')
-                content = result.get('content', 'No content')
+                content = page_contents.get(i, result.get('content', 'No content'))
                 url = result.get('url', 'No URL')
                 
-                # Try to get detailed content if available and needed
-                if url and not content and i <= 2:  # Only for top results
-                    try:
-                        response = self.session.get(url, timeout=5)
-                        content = self._extract_main_content(response.text)
-                        # Clean the extracted content
-                        content = self._clean_content_text(content)
-                    except:
-                        content = "Failed to retrieve content"
-                
-                formatted_result = f"{i}. {title}\n   {content[:500]}...\n   URL: {url}\n"
+                formatted_result = f"{i}. {title}\n   {content[:PAGE_SNIPPET_CHARS]}...\n   URL: {url}\n"
                 formatted_results.append(formatted_result)
             
             print("=======web search result:\n".join(formatted_results))
-            return "\n".join(formatted_results)
+            formatted = "\n".join(formatted_results)
+            
+            # Only cache real results, not backend errors
+            if not any(result.get('title') == 'Search Error' for result in results):
+                self.query_cache.put(cache_key, formatted)
+                # Written in the background so the save never counts against the tool deadline
+                self._schedule_cache_save()
+            return formatted
         except Exception as e:
             return f"Search failed: {str(e)}"
\ No newline at end of file
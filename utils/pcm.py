@@ -0,0 +1,20 @@
+import numpy as np
+from typing import Union
+
+PCMData = Union[bytes, bytearray, memoryview, np.ndarray]
+
+def pcm_to_float32(audio: PCMData) -> np.ndarray:
+    """
+    Convert 16-bit PCM (raw buffer or int16 array) or float32 samples to a
+    float32 array in [-1, 1], without copying the raw buffer first
+    """
+    if isinstance(audio, np.ndarray):
+        if audio.dtype == np.float32:
+            return audio
+        if audio.dtype != np.int16:
+            raise ValueError(f"Unsupported PCM dtype: {audio.dtype}")
+        samples = audio
+    else:
+        # View the buffer as int16 samples in place
+        samples = np.frombuffer(audio, dtype=np.int16)
+    return samples.astype(np.float32) / 32768.0
\ No newline at end of file
@@ -1,6 +1,7 @@
 import cv2
+import threading
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class Camera:
     """
@@ -8,46 +9,238 @@ class Camera:
     """
     def __init__(self, config: Dict[str, Any]):
         self.config = config
+        
+        # Always-on mode keeps the device open in a background thread holding the latest frame
+        self.always_on = config.get("camera_always_on", False)
+        self.capture_fps = config.get("camera_capture_fps", 10)
+        self.open_timeout = config.get("camera_open_timeout", 3.0)
+        self.idle_release = config.get("camera_idle_release", 60.0)  # seconds without requests
+        self.max_frame_age = config.get("camera_max_frame_age", 1.0)
+        
+        # Encoding of frames sent to the VLM
+        self.max_edge = config.get("camera_max_edge", 1024)
+        self.jpeg_quality = config.get("camera_jpeg_quality", 85)
+        self.grayscale = config.get("camera_grayscale", False)
+        
+        self._frame_lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._frame_lock)
+        self._latest_frame = None
+        self._latest_frame_time = 0.0
+        self._last_request_time = time.time()
+        self._capture_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
     
-    def capture_image(self, image_path: str = "captured_image.jpg") -> bool:
+    def start(self):
         """
-        Capture an image from the camera
+        Start the background capture thread when always-on mode is enabled
         """
-        try:
+        if not self.always_on:
+            return
+        with self._frame_lock:
+            self._last_request_time = time.time()
+            self._start_thread()
+    
+    def prewarm(self, hold: float):
+        """
+        Open the device ahead of a possible request without counting as one: a device
+        released for idleness is reopened and kept for `hold` seconds, a running one is left alone
+        """
+        if not self.always_on:
+            return
+        with self._frame_lock:
+            if self.is_running():
+                return
+            self._last_request_time = max(self._last_request_time, time.time() - self.idle_release + hold)
+            self._start_thread()
+    
+    def is_running(self) -> bool:
+        return self._capture_thread is not None and self._capture_thread.is_alive()
+    
+    def has_fresh_frame(self) -> bool:
+        """
+        Whether a request right now would be served without waiting for the device
+        """
+        with self._frame_lock:
+            return (self._latest_frame is not None
+                    and time.time() - self._latest_frame_time <= self.max_frame_age)
+    
+    def _start_thread(self):
+        # Called with _frame_lock held
+        if self.is_running():
+            return
+        self._stop_event.clear()
+        self._capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._capture_thread.start()
+    
+    def stop(self):
+        """
+        Stop the background capture thread and release the device
+        """
+        self._stop_event.set()
+        thread = self._capture_thread
+        if thread is not None:
+            thread.join(timeout=self.open_timeout + 1.0)
+    
+    def _open_device(self):
+        """
+        Open the capture device, giving up after camera_open_timeout seconds
+        """
+        result = {}
+        
+        def open_device():
             cap = cv2.VideoCapture(self.config.get("camera_device_index", 0))
-            
-            # Check if camera opened successfully
-            if not cap.isOpened():
-                print("Error: Could not open camera")
+            result["cap"] = cap
+            # Release a device that finished opening after we gave up waiting
+            if result.get("abandoned"):
+                cap.release()
+        
+        opener = threading.Thread(target=open_device, daemon=True)
+        opener.start()
+        opener.join(self.open_timeout)
+        if opener.is_alive():
+            result["abandoned"] = True
+            print(f"Error: Camera did not open within {self.open_timeout} s")
+            return None
+        
+        cap = result["cap"]
+        if not cap.isOpened():
+            print("Error: Could not open camera")
+            cap.release()
+            return None
+        return cap
+    
+    def _warm_up(self, cap) -> bool:
+        # Read a few frames to let the camera adjust exposure and focus
+        warmup_frames = self.config.get("camera_warmup_frames", 5)
+        warmup_delay = self.config.get("camera_warmup_delay", 0.1)
+        for i in range(warmup_frames):
+            ret, frame = cap.read()
+            if not ret:
+                print("Error: Could not read frame from camera")
                 return False
+            time.sleep(warmup_delay)  # Small delay between frames
+        return True
+    
+    def _capture_loop(self):
+        """
+        Keep the device open and hold only the most recent frame
+        """
+        cap = self._open_device()
+        if cap is None:
+            return
+        
+        try:
+            if not self._warm_up(cap):
+                return
             
-            # Allow camera to warm up and adjust
-            # Read a few frames to let the camera adjust exposure and focus
-            warmup_frames = self.config.get("camera_warmup_frames", 5)
-            warmup_delay = self.config.get("camera_warmup_delay", 0.1)
-            for i in range(warmup_frames):  # Skip first 5 frames
+            frame_interval = 1.0 / self.capture_fps
+            while not self._stop_event.is_set():
+                # Release the device after a period without requests to save power
+                if time.time() - self._last_request_time > self.idle_release:
+                    print("Camera idle, releasing device")
+                    break
+                
+                loop_start = time.time()
                 ret, frame = cap.read()
                 if not ret:
                     print("Error: Could not read frame from camera")
-                    cap.release()
-                    return False
-                time.sleep(warmup_delay)  # Small delay between frames
+                    break
+                with self._frame_ready:
+                    self._latest_frame = frame
+                    self._latest_frame_time = time.time()
+                    self._frame_ready.notify_all()
+                
+                self._stop_event.wait(max(0.0, frame_interval - (time.time() - loop_start)))
+        finally:
+            cap.release()
+            with self._frame_lock:
+                self._latest_frame = None
+    
+    def get_latest_frame(self):
+        """
+        Return the most recent frame from the capture thread, restarting it if it was released
+        """
+        self.start()
+        
+        # Allow time for the device to open and warm up after an idle release
+        warmup_time = self.config.get("camera_warmup_frames", 5) * self.config.get("camera_warmup_delay", 0.1)
+        deadline = time.time() + self.open_timeout + warmup_time + 1.0
+        with self._frame_ready:
+            while (self._latest_frame is None
+                   or time.time() - self._latest_frame_time > self.max_frame_age):
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.is_running():
+                    print("Error: No recent frame from camera")
+                    return None
+                self._frame_ready.wait(min(remaining, 0.1))
+            return self._latest_frame
+    
+    def _grab_frame(self):
+        """
+        Grab a single frame, from the capture thread in always-on mode or by opening the device
+        """
+        if self.always_on:
+            return self.get_latest_frame()
+        
+        cap = None
+        try:
+            cap = self._open_device()
+            if cap is None:
+                return None
+            
+            # Allow camera to warm up and adjust
+            if not self._warm_up(cap):
+                return None
             
             # Capture the actual frame
             ret, frame = cap.read()
-            if ret:
-                cv2.imwrite(image_path, frame)
-                cap.release()
-                return True
-            else:
+            if not ret:
                 print("Error: Could not capture frame")
-                cap.release()
-                return False
-                
+                return None
+            return frame
         except Exception as e:
             print(f"Error capturing image: {e}")
-            try:
+            return None
+        finally:
+            if cap is not None:
                 cap.release()
-            except:
-                pass
-            return False
\ No newline at end of file
+    
+    def encode_frame(self, frame) -> Optional[bytes]:
+        """
+        Encode a frame as JPEG in memory, capping its longest edge
+        """
+        if self.grayscale and frame.ndim == 3:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        
+        height, width = frame.shape[:2]
+        longest_edge = max(height, width)
+        if self.max_edge and longest_edge > self.max_edge:
+            scale = self.max_edge / longest_edge
+            frame = cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            print("Error: Could not encode frame")
+            return None
+        return encoded.tobytes()
+    
+    def capture_jpeg(self) -> Optional[bytes]:
+        """
+        Capture an image from the camera as encoded JPEG bytes
+        """
+        frame = self._grab_frame()
+        if frame is None:
+            return None
+        return self.encode_frame(frame)
+    
+    def capture_image(self, image_path: str = "captured_image.jpg") -> bool:
+        """
+        Capture an image from the camera and save it to a file
+        """
+        image_data = self.capture_jpeg()
+        if image_data is None:
+            return False
+        with open(image_path, "wb") as f:
+            f.write(image_data)
+        return True
\ No newline at end of file
@@ -3,21 +3,20 @@ import io
 import json
 import threading
 import time
-import wave
-import tempfile
-import os
+import uuid
 from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
 from typing import List, Dict, Any, Optional
 
-from components import WorkMemory, SessionManager, TextGuardrail
-from speech import ASR, VAD, TTS, SpeakerVerification
+from components import WorkMemory, SessionManager, TextGuardrail, SentenceSplitter, WorkerStage, IntentRouter
+from speech import ASR, VAD, TTS, SpeakerVerification, Endpointer
 from models import LLM, VLM
 from audio import AudioRecorder, AudioPlayer
 from vision import Camera
 from tools import SearchEngine
 from audio.audio_player import AudioStreamBuffer
 from utils.logger import print_timestamp_debug_log
-import edge_tts
 
 
 class VoiceChatAgent:
@@ -39,15 +38,45 @@ class VoiceChatAgent:
         # Session management
         self.session_manager = SessionManager(self.memory, config)
         
+        # Local intent routing, skipping the routing LLM round trip for clear requests
+        self.intent_router = IntentRouter(config)
+        
         # Audio recording
         self.audio_recorder = AudioRecorder(config)
-        self.silence_threshold = config.get("silence_threshold", 2.0)  # seconds
+        # End-of-turn detection, counting silence in samples so it is immune to scheduling delays
+        self.endpointer = Endpointer(config)
+        
+        # Recognition stages between capture and inference, so the capture loop never blocks
+        self.recognition_stage = WorkerStage(
+            "recognition",
+            self._recognize_utterance,
+            num_workers=config.get("recognition_workers", 1),
+            max_queue_size=config.get("recognition_queue_size", 4)
+        )
+        self.stream_chunks_rejected = 0  # audio chunks of the current utterance the stream worker refused
+        # Streaming ASR keeps decoder state, so its chunks are decoded in order by one worker.
+        # Under load new audio is rejected; start/end control events are never dropped.
+        self.asr_stream_stage = WorkerStage(
+            "asr-stream",
+            self._handle_asr_stream_event,
+            num_workers=1,
+            max_queue_size=config.get("asr_stream_queue_size", 256),
+            drop_oldest=False
+        )
+        self.asr_stream_finish_timeout = config.get("asr_stream_finish_timeout", 5.0)
+        # Batch ASR runs here, in parallel with speaker verification on the recognition worker
+        self.asr_executor = ThreadPoolExecutor(
+            max_workers=config.get("recognition_workers", 1),
+            thread_name_prefix="asr"
+        )
         
         # Threading and async management
         self.recording = False
         self.processing = False
         self.tts_queue = asyncio.Queue()
         self.event_loop = None  # Store the event loop reference
+        self.stop_event = None  # Set to end the agent wait loop
+        self.background_tasks = set()  # Keep references to fire-and-forget tasks
         
         # Interrupt flag
         self.user_speaking = False
@@ -55,6 +84,28 @@ class VoiceChatAgent:
         # Text guardrail for content safety
         self.text_guardrail = TextGuardrail(config)
         
+        # Tool execution deadlines (seconds), per tool name with a default
+        self.tool_timeout = config.get("tool_timeout", 15.0)
+        self.tool_timeouts = config.get("tool_timeouts", {})
+        # Tool output kept in session memory; the full output is only used for the follow-up reply
+        self.tool_result_max_chars = config.get("tool_result_max_chars", 200)
+        self.camera_lock = asyncio.Lock()
+        # Camera access is serialized on one thread shared by tool calls
+        self.camera_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="camera")
+        
+        # Reopen a camera released for idleness at speech onset, so a vision request does not
+        # wait for the device after the LLM round trip. The frame itself is read at tool time.
+        # Only with always-on capture; otherwise there is no background device to keep open
+        self.speculative_capture = config.get("speculative_capture", True) and self.camera.always_on
+        self.speculative_capture_window = config.get("speculative_capture_window", 10.0)  # seconds
+        self.speculation_stats = {"prewarms": 0, "vision_requests": 0, "warm": 0}
+        
+        # Sentence splitting for streaming LLM output into TTS
+        self.sentence_min_chars = config.get("tts_sentence_min_chars", 4)
+        self.sentence_max_chars = config.get("tts_sentence_max_chars", 60)
+        # Fixed phrases pre-synthesized into the TTS cache at startup
+        self.tts_cache_phrases = config.get("tts_cache_phrases", [])
+        
         # Tools for LLM
         self.tools = [
             {
@@ -102,72 +153,128 @@ class VoiceChatAgent:
             }
         ]
     
+    def _tool_response(self, tool_call, content: str) -> Dict[str, Any]:
+        return {
+            "tool_call_id": tool_call.id,
+            "role": "tool",
+            "name": tool_call.function.name,
+            "content": content
+        }
+    
+    def _start_speculative_capture(self):
+        """
+        Reopen the camera when speech starts, before the LLM asks for a frame.
+        This does not count as a camera request, so idle release still applies.
+        """
+        if not self.speculative_capture or self.camera.is_running():
+            return
+        self.camera.prewarm(self.speculative_capture_window)
+        self.speculation_stats["prewarms"] += 1
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """
+        Camera pre-open counters: how often a vision request found a fresh frame waiting
+        """
+        stats = dict(self.speculation_stats)
+        requests = stats["vision_requests"]
+        stats["warm_rate"] = stats["warm"] / requests if requests else 0.0
+        return stats
+    
+    async def _vision_analysis(self, tool_call, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        # The camera is a single device, so concurrent captures take turns
+        async with self.camera_lock:
+            if self.speculative_capture:
+                self.speculation_stats["vision_requests"] += 1
+                if self.camera.has_fresh_frame():
+                    self.speculation_stats["warm"] += 1
+            # Capture the latest frame and encode it in memory, off the event loop so other tools keep running
+            image_data = await asyncio.get_running_loop().run_in_executor(
+                self.camera_executor, self.camera.capture_jpeg
+            )
+            if image_data is None:
+                return self._tool_response(tool_call, "无法捕获图像")
+            
+            # Analyze with VLM
+            try:
+                result = await self.vlm.analyze(image_data, arguments["prompt"])
+                return self._tool_response(tool_call, result)
+            except Exception as e:
+                return self._tool_response(tool_call, f"视觉分析失败: {str(e)}")
+    
+    async def _web_search(self, tool_call, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        # Search the web
+        try:
+            # Extract engine and query from arguments
+            query = arguments.get("query", "")
+            engine = arguments.get("engine", "baidu")  # Default to Baidu
+            num_results = arguments.get("num_results", 5)
+            
+            result = await self.search_engine.search(query, engine, num_results)
+            return self._tool_response(tool_call, result)
+        except Exception as e:
+            return self._tool_response(tool_call, f"搜索失败: {str(e)}")
+    
+    async def _run_tool_call(self, tool_call) -> Dict[str, Any]:
+        """
+        Run a single tool call under its deadline; every call gets a response
+        """
+        function_name = tool_call.function.name
+        handlers = {
+            "vision_analysis": self._vision_analysis,
+            "web_search": self._web_search,
+        }
+        handler = handlers.get(function_name)
+        if handler is None:
+            # The API requires a tool message for every call id in the assistant message
+            print(f"Unknown tool requested: {function_name}")
+            return self._tool_response(tool_call, f"未知工具: {function_name}")
+        
+        timeout = self.tool_timeouts.get(function_name, self.tool_timeout)
+        start_time = time.time()
+        try:
+            arguments = json.loads(tool_call.function.arguments)
+            return await asyncio.wait_for(handler(tool_call, arguments), timeout)
+        except asyncio.TimeoutError:
+            print(f"Tool {function_name} timed out after {timeout} s")
+            return self._tool_response(tool_call, "工具调用超时")
+        except Exception as e:
+            return self._tool_response(tool_call, f"工具调用失败: {str(e)}")
+        finally:
+            print_timestamp_debug_log(f"Tool {function_name} takes: {time.time()-start_time} s")
+    
     async def handle_tool_calls(self, tool_calls) -> List[Dict[str, Any]]:
         """
         Handle tool calls from LLM
+        Independent calls run concurrently; responses keep the order of tool_calls
+        """
+        return list(await asyncio.gather(*(self._run_tool_call(tool_call) for tool_call in tool_calls)))
+    
+    async def _stream_llm_reply(self, messages: List[Dict[str, Any]], sentence_queue: Optional[asyncio.Queue] = None,
+                                tools: Optional[List[Dict]] = None, tool_calls: Optional[list] = None,
+                                summary: str = "") -> str:
+        """
+        Stream an LLM reply and push each complete sentence to the TTS stage
         """
-        tool_responses = []
+        splitter = SentenceSplitter(self.sentence_min_chars, self.sentence_max_chars)
+        parts = []
         
-        for tool_call in tool_calls:
-            function_name = tool_call.function.name
-            arguments = json.loads(tool_call.function.arguments)
-            
-            if function_name == "vision_analysis":
-                # Capture image
-                image_path = "captured_image.jpg"
-                if self.camera.capture_image(image_path):
-                    # Analyze with VLM
-                    try:
-                        result = await self.vlm.analyze(image_path, arguments["prompt"])
-                        tool_responses.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                            "content": result
-                        })
-                    except Exception as e:
-                        tool_responses.append({
-                            "tool_call_id": tool_call.id,
-                            "role": "tool",
-                            "name": function_name,
-                        "content": f"视觉分析失败: {str(e)}"
-                        })
-                else:
-                    tool_responses.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": "无法捕获图像"
-                    })
-            
-            elif function_name == "web_search":
-                # Search the web
-                try:
-                    # Extract engine and query from arguments
-                    query = arguments.get("query", "")
-                    engine = arguments.get("engine", "baidu")  # Default to Baidu
-                    num_results = arguments.get("num_results", 5)
-                    
-                    result = await self.search_engine.search(query, engine, num_results)
-                    tool_responses.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": result
-                    })
-                except Exception as e:
-                    tool_responses.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": f"搜索失败: {str(e)}"
-                    })
-        
-        return tool_responses
+        async for delta in self.llm.generate_stream(messages, tools, tool_calls, summary):
+            parts.append(delta)
+            if sentence_queue is not None:
+                for sentence in splitter.feed(delta):
+                    await sentence_queue.put(sentence)
+        
+        if sentence_queue is not None:
+            remainder = splitter.flush()
+            if remainder:
+                await sentence_queue.put(remainder)
+        
+        return "".join(parts)
     
-    async def process_text_with_llm(self, text: str) -> str:
+    async def process_text_with_llm(self, text: str, sentence_queue: Optional[asyncio.Queue] = None) -> str:
         """
-        Process text with LLM and handle tool calls
+        Process text with LLM and handle tool calls.
+        Reply sentences are pushed to sentence_queue as soon as they are generated.
         """
         # Check and update session context
         current_session_id = self.session_manager.check_and_update_session(text)
@@ -175,25 +282,51 @@ class VoiceChatAgent:
         # Add user message to memory
         self.memory.add_message(current_session_id, "user", text)
         
-        # Get conversation history for current session
+        # Get conversation history for current session, with the summary of earlier turns
         history = self.memory.get_history(current_session_id)
+        summary = self.memory.get_summary(current_session_id)
         
-        # Get LLM response
-        start_time = time.time()
-        response = await self.llm.generate(history, self.tools)
-        print_timestamp_debug_log(f"Main routing LLM takes: {time.time()-start_time} s")
+        tool_calls = []
+        previous_reply = next((message.get("content") for message in reversed(history)
+                               if message["role"] == "assistant" and message.get("content")), None)
+        intent = self.intent_router.route(text, previous_reply)
+        if intent is not None:
+            print_timestamp_debug_log(f"Local intent router: {intent[0]}")
+            if self.intent_router.should_shadow_check():
+                self._start_background_task(self._shadow_check_intent(list(history), summary, intent[0]))
+        
+        if intent is None:
+            # Get LLM response, streaming any direct reply straight into TTS
+            start_time = time.time()
+            content = await self._stream_llm_reply(history, sentence_queue, self.tools, tool_calls, summary)
+            elapsed = time.time() - start_time
+            print_timestamp_debug_log(f"Main routing LLM takes: {elapsed} s")
+            # A tool-call response is the bare routing round trip; direct replies include the answer itself
+            if tool_calls:
+                self.intent_router.record_llm_routing(elapsed)
+        elif intent[0] == "chat":
+            # Chit-chat never needs tools, so generate the reply without tool definitions
+            content = await self._stream_llm_reply(history, sentence_queue, summary=summary)
+        else:
+            # Call the tool directly, as if the routing LLM had requested it
+            content = ""
+            tool_calls.append(SimpleNamespace(
+                id=f"call_{uuid.uuid4().hex[:24]}",
+                type="function",
+                function=SimpleNamespace(name=intent[0], arguments=json.dumps(intent[1], ensure_ascii=False))
+            ))
         
         # Handle tool calls if any
-        if hasattr(response, 'tool_calls') and response.tool_calls:
+        if tool_calls:
             # Get tool responses
             start_time = time.time()
-            tool_responses = await self.handle_tool_calls(response.tool_calls)
+            tool_responses = await self.handle_tool_calls(tool_calls)
             print_timestamp_debug_log(f"Handle tool_calls takes: {time.time()-start_time} s")
             
             # Add the assistant message with tool calls to history first
             assistant_message = {
                 "role": "assistant",
-                "content": response.content if response.content else "",
+                "content": content,
                 "tool_calls": [  # Convert tool_calls to the proper format
                     {
                         "id": tc.id,
@@ -202,29 +335,77 @@ class VoiceChatAgent:
                             "name": tc.function.name,
                             "arguments": tc.function.arguments
                         }
-                    } for tc in response.tool_calls
+                    } for tc in tool_calls
                 ]
             }
-            history.append(assistant_message)
             
-            # Add tool responses to history
-            for tool_response in tool_responses:
-                history.append(tool_response)
+            # Tool call and raw results only live in this turn's scratchpad, not in session memory
+            scratchpad = [*history, assistant_message, *tool_responses]
             
             # Get final response after tool calls
             start_time = time.time()
-            final_response = await self.llm.generate(history)
+            reply = await self._stream_llm_reply(scratchpad, sentence_queue, summary=summary)
             print_timestamp_debug_log(f"LLM final summarize takes: {time.time()-start_time} s")
-            reply = final_response.content
+            
+            # Remember the tool call with truncated results, keeping it out of the spoken reply
+            self.memory.add_message(current_session_id, "assistant", content,
+                                    tool_calls=assistant_message["tool_calls"])
+            for tool_response in tool_responses:
+                self.memory.add_message(current_session_id, "tool", self._truncate_tool_output(tool_response["content"]),
+                                        tool_call_id=tool_response["tool_call_id"], name=tool_response["name"])
         else:
-            reply = response.content
+            reply = content
         
         # Add assistant message to memory
         self.memory.add_message(current_session_id, "assistant", reply)
         
+        # Fold older turns into the summary in the background, off the reply path
+        pending = self.memory.take_messages_to_summarize(current_session_id)
+        if pending is not None:
+            self._start_background_task(self._summarize_memory(current_session_id, *pending))
+        
         return reply
     
-    def _start_recording(self, data: bytes) -> tuple:
+    def _start_background_task(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.background_tasks.add(task)
+        task.add_done_callback(self.background_tasks.discard)
+    
+    async def _shadow_check_intent(self, history: List[Dict[str, Any]], summary: str, local_intent: str):
+        """
+        Ask the routing LLM for its decision on a locally routed turn, to measure router accuracy
+        """
+        try:
+            message = await self.llm.generate(history, self.tools, summary)
+            llm_intent = message.tool_calls[0].function.name if message.tool_calls else "chat"
+            self.intent_router.record_shadow_result(local_intent, llm_intent)
+            print_timestamp_debug_log(f"Intent router stats: {self.intent_router.get_stats()}")
+        except Exception as e:
+            print(f"Intent shadow check failed: {e}")
+    
+    def _truncate_tool_output(self, content: str) -> str:
+        """
+        Shorten tool output before it is kept in session memory
+        """
+        if len(content) > self.tool_result_max_chars:
+            return content[:self.tool_result_max_chars] + "…"
+        return content
+    
+    async def _summarize_memory(self, session_id: str, previous_summary: str, messages: List[Dict[str, Any]]):
+        """
+        Summarize older turns and replace them in memory
+        """
+        start_time = time.time()
+        summary = None
+        try:
+            summary = await self.llm.summarize(previous_summary, messages)
+            print_timestamp_debug_log(f"Memory summary of {len(messages)} messages takes: {time.time()-start_time} s")
+        except Exception as e:
+            print(f"Memory summarization failed: {e}")
+        finally:
+            self.memory.apply_summary(session_id, summary, messages)
+    
+    def _start_recording(self, data: bytes, frames: List[bool]) -> list:
         """
         Start recording when speech is detected
         """
@@ -234,14 +415,30 @@ class VoiceChatAgent:
         # Note: We no longer interrupt audio here, but will do so after
         # confirming 1 second of continuous speech
         
-        return [data], None  # recording_buffer, silence_start
+        # Start decoding right away in streaming ASR mode
+        if self.asr.streaming:
+            self.stream_chunks_rejected = 0
+            self.asr_stream_stage.submit(("start", None), droppable=False)
+            self._submit_stream_audio(data)
+        
+        # Reopen a released camera now so a vision request does not wait for it after the LLM round trip
+        self._start_speculative_capture()
+        
+        self.endpointer.start()
+        self.endpointer.update(data, frames)
+        
+        return [data]  # recording_buffer
 
-    def _process_audio_chunk(self, data: bytes, recording_buffer: list, silence_start: float) -> tuple:
+    def _process_audio_chunk(self, data: bytes, frames: List[bool], recording_buffer: list) -> tuple:
         """
-        Process an audio chunk during recording
+        Process an audio chunk during recording, using its already classified VAD frames
         """
         recording_buffer.append(data)
-        is_speech = self.audio_recorder.vad.is_speech(data)
+        is_speech = any(frames)
+        
+        # Keep the streaming decoder up to date while the user speaks
+        if self.asr.streaming:
+            self._submit_stream_audio(data)
         
         # Check if we should interrupt audio playback
         # Only interrupt if we've detected 1+ seconds of continuous speech
@@ -252,17 +449,19 @@ class VoiceChatAgent:
                 if self.audio_player.interrupt():
                     print("Interrupted ongoing audio playback due to sustained speech")
         
-        if not is_speech:
-            if silence_start is None:
-                silence_start = time.time()
-            elif time.time() - silence_start >= self.silence_threshold:
-                # End of utterance - silence threshold reached
-                return recording_buffer, silence_start, True  # finished_recording
-        else:
-            # Reset silence timer if speech detected
-            silence_start = None
+        # Adaptive endpointing, using the streaming partial transcript when available
+        partial_text = self.asr.partial_text if self.asr.streaming else ""
+        finished = self.endpointer.update(data, frames, partial_text)
+        if finished:
+            # End of utterance - enough trailing silence for this turn
+            return recording_buffer, True  # finished_recording
             
-        return recording_buffer, silence_start, False
+        return recording_buffer, False
+    
+    def _submit_stream_audio(self, data: bytes):
+        # A rejected chunk leaves a gap in the streaming transcript of this utterance
+        if not self.asr_stream_stage.submit(("audio", data)):
+            self.stream_chunks_rejected += 1
     
     def _process_complete_utterance(self, recording_buffer: list):
         """
@@ -277,42 +476,91 @@ class VoiceChatAgent:
         # Update last user activity time
         self.session_manager.update_activity_time()
         
-        # Process the recorded audio
+        # Hand the recorded audio to the recognition workers
         if len(recording_buffer) > 0:
             # Convert to bytes
             audio_data = b''.join(recording_buffer)
             
-            # Speaker verification
-            if not self.speaker_verification.verify(audio_data):
-                print("Speaker verification failed. Skipping further processing.")
-                return
-            
-            # Save to temporary WAV file
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp_file:
-                temp_filename = tmp_file.name
+            # In streaming mode the stream worker resolves the transcript once it has flushed the tail
+            transcript = None
+            if self.asr.streaming:
+                transcript = Future()
+                self.asr_stream_stage.submit(("end", transcript), droppable=False)
+                if self.stream_chunks_rejected and self.asr.model is not None:
+                    # The stream missed audio under load, so decode the full buffer in batch instead
+                    print(f"Streaming ASR dropped {self.stream_chunks_rejected} chunks, using batch decoding")
+                    transcript = None
             
+            self.recognition_stage.submit({"audio": audio_data, "transcript": transcript})
+            print_timestamp_debug_log(f"Recognition stats: {self.recognition_stage.get_stats()}")
+    
+    def _handle_asr_stream_event(self, event: tuple):
+        """
+        Streaming ASR worker: apply start / audio / end events in capture order
+        """
+        kind, payload = event
+        if kind == "start":
+            self.asr.start_stream()
+        elif kind == "audio":
+            previous_text = self.asr.partial_text
+            partial_text = self.asr.feed_stream(payload)
+            if partial_text != previous_text:
+                print_timestamp_debug_log(f"Partial: {partial_text}")
+        elif kind == "end":
             try:
-                # Write audio data to temporary WAV file
-                with wave.open(temp_filename, 'wb') as wf:
-                    wf.setnchannels(1)  # Mono
-                    wf.setsampwidth(2)  # 16 bits
-                    wf.setframerate(self.audio_recorder.sample_rate)
-                    wf.writeframes(audio_data)
-                
-                # Transcribe using ASR
+                payload.set_result(self.asr.finish_stream())
+            except Exception as e:
+                payload.set_exception(e)
+    
+    def _recognize_utterance(self, job: Dict[str, Any]):
+        """
+        Recognition worker: speaker verification and ASR for one utterance
+        """
+        audio_data = job["audio"]
+        
+        # Start batch ASR together with speaker verification on the same buffer.
+        # In streaming mode the stream worker is already finishing the transcript.
+        asr_future = None
+        if job["transcript"] is None:
+            asr_future = self.asr_executor.submit(self.asr.transcribe, audio_data)
+        
+        # Speaker verification
+        if not self.speaker_verification.verify(audio_data):
+            # Drop ASR before it starts if possible, otherwise its result is discarded
+            if asr_future is not None:
+                asr_future.cancel()
+            print("Speaker verification failed. Skipping further processing.")
+            return
+        
+        if asr_future is not None:
+            text = asr_future.result()
+        else:
+            # Streaming ASR already decoded most of the utterance, only the tail was flushed
+            try:
+                text = job["transcript"].result(timeout=self.asr_stream_finish_timeout)
+            except Exception as e:
+                if self.asr.model is None:
+                    print(f"Streaming ASR result unavailable and batch fallback is disabled: {e}")
+                    return
+                print(f"Streaming ASR result unavailable, falling back to batch decoding: {e}")
                 text = self.asr.transcribe(audio_data)
-                print(f"Recognized: {text}")
-                
-                # Process in a separate task to avoid blocking
-                if self.event_loop:
-                    asyncio.run_coroutine_threadsafe(
-                        self.process_user_input(text), 
-                        self.event_loop
-                    )
-            finally:
-                # Clean up temporary file
-                if os.path.exists(temp_filename):
-                    os.unlink(temp_filename)
+        print(f"Recognized: {text}")
+        
+        # Process in a separate task to avoid blocking
+        if self.event_loop:
+            asyncio.run_coroutine_threadsafe(
+                self.process_user_input(text), 
+                self.event_loop
+            )
+    
+    def get_recognition_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Queue depth, processed and dropped counters of the recognition stages
+        """
+        return {
+            "recognition": self.recognition_stage.get_stats(),
+            "asr_stream": self.asr_stream_stage.get_stats(),
+        }
     
     def record_audio(self):
         """
@@ -325,8 +573,9 @@ class VoiceChatAgent:
         # Recording state variables
         recording_buffer = []
         is_recording = False
-        silence_start = None
         stream_open = True
+        vad = self.audio_recorder.vad
+        vad.reset()
         
         try:
             while self.recording:
@@ -335,19 +584,21 @@ class VoiceChatAgent:
                 if data is None:
                     continue  # Skip this chunk due to overflow
                 
-                # Check for speech
-                is_speech = self.audio_recorder.vad.is_speech(data)
+                # Classify every VAD frame of the chunk exactly once
+                frames = vad.process_chunk(data)
                 
-                if not is_recording and is_speech:
+                if not is_recording and not any(frames):
+                    # Learn the background noise level between turns
+                    self.endpointer.observe_noise(data)
+                
+                elif not is_recording:
                     # Start recording when speech is detected
                     is_recording = True
-                    recording_buffer, silence_start = self._start_recording(data)
+                    recording_buffer = self._start_recording(data, frames)
                 
                 elif is_recording:
                     # Process audio chunk during recording
-                    recording_buffer, silence_start, finished = self._process_audio_chunk(
-                        data, recording_buffer, silence_start
-                    )
+                    recording_buffer, finished = self._process_audio_chunk(data, frames, recording_buffer)
                     
                     if finished:
                         # Process complete utterance
@@ -356,7 +607,6 @@ class VoiceChatAgent:
                         # Reset recording state
                         is_recording = False
                         recording_buffer = []
-                        silence_start = None
                         
         except KeyboardInterrupt:
             print("Recording stopped")
@@ -375,18 +625,26 @@ class VoiceChatAgent:
         
         self.processing = True
         
+        # LLM and TTS run as two concurrent stages joined by a sentence queue
+        sentence_queue = asyncio.Queue()
+        speak_task = asyncio.create_task(self._speak_sentences(sentence_queue))
+        
         try:
-            # Process with LLM
-            llm_response = await self.process_text_with_llm(text)
+            # Process with LLM, speaking each sentence as soon as it is complete
+            llm_response = await self.process_text_with_llm(text, sentence_queue)
             print_timestamp_debug_log(f"LLM Response: {llm_response}")
-            
-            # Convert to speech and play
-            await self.text_to_speech_and_play(llm_response)
+        except Exception as e:
+            print(f"Error processing user input: {e}")
+        finally:
+            # Mark end of reply for the TTS stage
+            await sentence_queue.put(None)
+        
+        try:
+            # Wait for the remaining speech to finish
+            await speak_task
             # Update session activity time
             print_timestamp_debug_log("Speech done, updating session activity time...")
             self.session_manager.update_activity_time()
-        except Exception as e:
-            print(f"Error processing user input: {e}")
         finally:
             self.processing = False
     
@@ -397,9 +655,16 @@ class VoiceChatAgent:
         self.recording = True
         # Store reference to the event loop
         self.event_loop = asyncio.get_event_loop()
-        # Start recording in a separate thread
+        # Start recognition workers, then recording in a separate thread
+        self.recognition_stage.start()
+        if self.asr.streaming:
+            self.asr_stream_stage.start()
         recording_thread = threading.Thread(target=self.record_audio)
         recording_thread.start()
+        # Open the camera in the background when always-on capture is enabled
+        self.camera.start()
+        # Pre-synthesize fixed phrases in the background
+        warm_up_task = self.event_loop.create_task(self._warm_up_tts())
         
         try:
             # Run the asyncio event loop in the main thread
@@ -409,64 +674,143 @@ class VoiceChatAgent:
         finally:
             self.recording = False
             recording_thread.join()
+            warm_up_task.cancel()
+            self.asr_stream_stage.stop()
+            self.recognition_stage.stop()
+            self.asr_executor.shutdown(wait=False, cancel_futures=True)
+            self.camera_executor.shutdown(wait=False, cancel_futures=True)
+            # Release pooled network connections and the audio device
+            self.event_loop.run_until_complete(self.search_engine.close())
+            self.audio_player.close()
+            self.camera.stop()
+            if self.speculative_capture:
+                print_timestamp_debug_log(f"Camera pre-open stats: {self.get_speculation_stats()}")
+            print_timestamp_debug_log(f"Intent router stats: {self.intent_router.get_stats()}")
+            # Commit conversation history still in the write-behind queue
+            self.memory.close()
+    
+    async def _warm_up_tts(self):
+        """
+        Fill the TTS cache with phrases that are spoken often
+        """
+        # Guardrail warnings are spoken word for word whenever text is rejected
+        phrases = list(self.tts_cache_phrases) + self.text_guardrail.warning_messages()
+        if self.tts.cache is None or not phrases:
+            return
+        
+        start_time = time.time()
+        await self.tts.presynthesize([self._prepare_speech(phrase) for phrase in phrases])
+        print_timestamp_debug_log(f"TTS cache warmed up in {time.time()-start_time} s: {self.tts.cache.get_stats()}")
     
     async def _agent_wait_loop(self):
         """
-        Agent wait loop, async sleeping
+        Agent wait loop, sleeping until stop() is called
         """
-        # This is a placeholder for any async tasks that need to run
-        while self.recording:
-            await asyncio.sleep(0.1)
+        # Wait on an event instead of waking the loop periodically
+        self.stop_event = asyncio.Event()
+        if self.recording:
+            await self.stop_event.wait()
     
-    async def text_to_speech_and_play(self, text: str):
+    def stop(self):
         """
-        Convert text to speech and play it with streaming
+        Stop the agent; safe to call from any thread
         """
+        self.recording = False
+        if self.event_loop is not None and self.stop_event is not None:
+            self.event_loop.call_soon_threadsafe(self.stop_event.set)
+    
+    def _prepare_speech(self, text: str) -> tuple:
+        """
+        Apply the text guardrail and pick a voice
+        Returns (text_to_speak, voice)
+        """
+        # Apply text guardrail to LLM output before TTS
+        is_valid, message, cleaned_text = self.text_guardrail.validate_and_clean(text)
+        
+        # If text is not valid, inform the user
+        if not is_valid:
+            print(f"Text Guardrail Warning: {message}")
+            # Use the warning message for TTS instead
+            text_to_speak = message
+        else:
+            # Use the cleaned text for TTS
+            text_to_speak = cleaned_text
+            print(f"Text Guardrail: {message}")
+        
+        # Detect language and select appropriate voice
+        language = self._detect_language(text_to_speak)
+        
+        if language == "en":
+            voice = "en-GB-SoniaNeural"
+        else:  # Default to Chinese
+            voice = "zh-CN-XiaoxiaoNeural"
+        
+        return text_to_speak, voice
+    
+    async def _speak_sentences(self, sentence_queue: asyncio.Queue):
+        """
+        TTS pipeline stage: synthesize sentences as they arrive and feed them into
+        one playback stream, so the next sentence is synthesized while the
+        previous one is still playing. A None item marks the end of the reply.
+        """
+        audio_stream = AudioStreamBuffer(min_chunk_size=3200)  # ~200ms minimum
+        play_task = None
+        start_time = time.time()
+        
         try:
-            # Apply text guardrail to LLM output before TTS
-            is_valid, message, cleaned_text = self.text_guardrail.validate_and_clean(text)
-            
-            # If text is not valid, inform the user
-            if not is_valid:
-                print(f"Text Guardrail Warning: {message}")
-                # Use the warning message for TTS instead
-                text_to_speak = message
-            else:
-                # Use the cleaned text for TTS
-                text_to_speak = cleaned_text
-                print(f"Text Guardrail: {message}")
-            
-            # Detect language and select appropriate voice
-            language = self._detect_language(text_to_speak)
-            
-            if language == "en":
-                voice = "en-GB-SoniaNeural"
-            else:  # Default to Chinese
-                voice = "zh-CN-XiaoxiaoNeural"
-            
-            # Use edge-tts for streaming audio generation
-            communicate = edge_tts.Communicate(text_to_speak, voice)
-            
-            print_timestamp_debug_log(f"TTS Generating audio...")
-            # Stream audio and play in chunks
-            audio_stream = AudioStreamBuffer(min_chunk_size=3200)  # ~200ms minimum
-            
-            # Start playing as soon as we have enough data
-            play_task = asyncio.create_task(
-                self.audio_player.play_stream(audio_stream)
-            )
-            
-            # Feed audio data to the stream
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    await audio_stream.write(chunk["data"])
+            while True:
+                sentence = await sentence_queue.get()
+                if sentence is None:
+                    break
+                
+                # Playback was interrupted, drop the rest of the reply
+                if play_task is not None and play_task.done():
+                    continue
+                
+                text_to_speak, voice = self._prepare_speech(sentence)
+                if not text_to_speak.strip():
+                    continue
+                
+                try:
+                    if play_task is None:
+                        print_timestamp_debug_log(f"TTS first sentence after {time.time()-start_time} s: {text_to_speak}")
+                        # Start playing as soon as we have enough data
+                        play_task = asyncio.create_task(
+                            self.audio_player.play_stream(audio_stream)
+                        )
                     
+                    # Feed audio data to the stream, served from the TTS cache when possible
+                    async for chunk in self.tts.stream(text_to_speak, voice):
+                        await audio_stream.write(chunk)
+                except Exception as e:
+                    print(f"TTS error for sentence '{text_to_speak}': {e}")
+        finally:
             # Mark end of stream
             await audio_stream.finish()
             
             # Wait for playback to complete
-            await play_task
-            
+            if play_task is not None:
+                try:
+                    await play_task
+                except Exception as e:
+                    print(f"Playback error: {e}")
+                print_timestamp_debug_log(f"Audio stream stats: {audio_stream.get_stats()}")
+    
+    async def text_to_speech_and_play(self, text: str):
+        """
+        Convert text to speech and play it with streaming
+        """
+        sentence_queue = asyncio.Queue()
+        splitter = SentenceSplitter(self.sentence_min_chars, self.sentence_max_chars)
+        for sentence in splitter.feed(text):
+            sentence_queue.put_nowait(sentence)
+        remainder = splitter.flush()
+        if remainder:
+            sentence_queue.put_nowait(remainder)
+        sentence_queue.put_nowait(None)
+        
+        try:
+            await self._speak_sentences(sentence_queue)
         except Exception as e:
             print(f"TTS or playback error: {e}")
     